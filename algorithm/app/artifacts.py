@@ -0,0 +1,107 @@
+from datetime import datetime
+import json
+import logging
+import os
+import shutil
+
+from app.factorization import FactorizationModel
+from app.model import RecommendationModel
+
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+MODEL_KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", "5"))
+
+# Model trained by /train: "logistic" (per-user/post biases) or "als" (embeddings + ANN index)
+MODEL_MODE = os.getenv("MODEL_MODE", "logistic")
+
+MODEL_TYPES = {
+    RecommendationModel.mode: RecommendationModel,
+    FactorizationModel.mode: FactorizationModel,
+}
+
+
+def new_model(mode=MODEL_MODE):
+    return MODEL_TYPES[mode]()
+
+# File inside MODEL_DIR naming the version every worker should serve
+CURRENT_FILE = "CURRENT"
+
+
+def list_versions(model_dir=MODEL_DIR):
+    """Complete artifact versions, oldest first."""
+    if not os.path.isdir(model_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(model_dir)
+        if os.path.isfile(os.path.join(model_dir, name, "meta.json"))
+    )
+
+
+def current_version(model_dir=MODEL_DIR):
+    try:
+        with open(os.path.join(model_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def save_version(model, model_dir=MODEL_DIR):
+    """
+    Persist a trained model as a new version and return its name.
+
+    The artifact is written to a temporary directory and renamed into place,
+    so readers never see a partially written version.
+    """
+    version = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    path = os.path.join(model_dir, version)
+    tmp_path = path + ".tmp"
+
+    model.save(tmp_path)
+    os.rename(tmp_path, path)
+    model.version = version
+    return version
+
+
+def promote(version, model_dir=MODEL_DIR):
+    """Point CURRENT at `version`; the pointer is replaced atomically."""
+    if version not in list_versions(model_dir):
+        raise FileNotFoundError(f"Model version {version} not found in {model_dir}")
+
+    tmp_path = os.path.join(model_dir, CURRENT_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(model_dir, CURRENT_FILE))
+
+
+def load_version(version=None, model_dir=MODEL_DIR):
+    """Load `version`, or the current one when omitted. Returns None if there is nothing to load."""
+    version = version or current_version(model_dir)
+    if not version:
+        return None
+
+    path = os.path.join(model_dir, version)
+    with open(os.path.join(path, "meta.json")) as f:
+        # Artifacts written before model modes existed are logistic
+        mode = json.load(f).get("mode", RecommendationModel.mode)
+
+    model = MODEL_TYPES[mode].load(path)
+    model.version = version
+    return model
+
+
+def prune(model_dir=MODEL_DIR, keep=MODEL_KEEP_VERSIONS):
+    """Delete the oldest versions beyond `keep`, never the current one."""
+    current = current_version(model_dir)
+    stale = [v for v in list_versions(model_dir)[:-keep] if v != current] if keep > 0 else []
+    for version in stale:
+        try:
+            shutil.rmtree(os.path.join(model_dir, version))
+        except OSError as e:
+            logging.warning(f"Could not remove model version {version}: {e}")
+
+
+def publish(model, model_dir=MODEL_DIR):
+    """Save a freshly trained model, make it current and drop old versions."""
+    version = save_version(model, model_dir)
+    promote(version, model_dir)
+    prune(model_dir)
+    return version
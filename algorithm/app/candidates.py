@@ -0,0 +1,288 @@
+from datetime import datetime, timedelta
+import logging
+import os
+
+from bson import ObjectId
+import numpy as np
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from app.content import cold_start_scores
+from app.utils import get_time_filtered_query
+
+# Posts newer than this are preferred; older ones inside the window only fill gaps
+RECENT_DAYS = 3
+WINDOW_DAYS = 5
+
+# Upper bound on posts held by the shared candidate pool, and its refresh period in seconds
+CANDIDATE_POOL_MAX = int(os.getenv("CANDIDATE_POOL_MAX", "200000"))
+CANDIDATE_POOL_REFRESH = float(os.getenv("CANDIDATE_POOL_REFRESH", "30"))
+
+# Fields the feed endpoints read from a post; leaves out the likes array
+POST_PROJECTION = {
+    "_id": 1,
+    "text": 1,
+    "author": 1,
+    "category": 1,
+    "likeCount": 1,
+    "commentCount": 1,
+    "shareCount": 1,
+    "hashtags": 1,
+    "createdAt": 1,
+    "media": 1,
+}
+
+# Equality (visibility) first, then the sort key, then the createdAt range
+POST_INDEXES = [
+    IndexModel([("visibility", ASCENDING), ("createdAt", DESCENDING)], name="feed_recent"),
+    IndexModel(
+        [("visibility", ASCENDING), ("likeCount", DESCENDING), ("createdAt", DESCENDING)],
+        name="feed_popular",
+    ),
+    IndexModel(
+        [("visibility", ASCENDING), ("author", ASCENDING), ("createdAt", DESCENDING)],
+        name="feed_author",
+    ),
+    IndexModel(
+        [("visibility", ASCENDING), ("category", ASCENDING), ("createdAt", DESCENDING)],
+        name="feed_category",
+    ),
+]
+
+
+async def ensure_indexes(db):
+    """Create the compound indexes candidate retrieval relies on (no-op if they exist)."""
+    try:
+        await db.posts.create_indexes(POST_INDEXES)
+    except Exception as e:
+        logging.error(f"Could not create post indexes: {e}")
+
+
+async def fetch_candidates(db, query, seen, count, minimum, sort=("createdAt", -1)):
+    """
+    Fetch unseen candidate posts for `query` with a single indexed query.
+
+    Reads the WINDOW_DAYS window once, sorted and projected, and keeps up to
+    `count` posts from the last RECENT_DAYS. Only when fewer than `minimum`
+    recent posts exist are up to `count` older posts from the window added,
+    which is what the former 3-day query with a 5-day fallback returned.
+    """
+    recent_cutoff = datetime.now() - timedelta(days=RECENT_DAYS)
+    newest_first = sort == ("createdAt", -1)
+
+    cursor = db.posts.find(
+        {**query, **get_time_filtered_query(WINDOW_DAYS)}, POST_PROJECTION
+    ).sort(*sort).batch_size(count * 2)
+
+    recent, older = [], []
+    async for post in cursor:
+        if post["_id"].binary in seen:
+            continue
+        if post["createdAt"] >= recent_cutoff:
+            recent.append(post)
+            if len(recent) >= count:
+                break
+        elif newest_first and len(recent) >= minimum:
+            # Newest-first: nothing recent follows and older posts are not needed
+            break
+        elif len(older) < count:
+            older.append(post)
+            if newest_first and len(older) >= count:
+                break
+
+    if len(recent) < minimum:
+        return recent + older
+    return recent
+
+
+class PostColumns:
+    """Post documents alongside columnar arrays of the fields used for filtering and scoring."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.post_ids = [str(d["_id"]) for d in docs]
+        # Raw 12-byte ObjectIds so membership tests are vectorized
+        self.ids = np.array([d["_id"].binary for d in docs], dtype="S12")
+        self.author = np.array([d["author"].binary for d in docs], dtype="S12")
+        self.category = np.array(
+            [d["category"].binary if d.get("category") else b"" for d in docs], dtype="S12"
+        )
+        self.like_count = np.array([d.get("likeCount", 0) for d in docs], dtype=np.float64)
+        self.comment_count = np.array([d.get("commentCount", 0) for d in docs], dtype=np.float64)
+        self.share_count = np.array([d.get("shareCount", 0) for d in docs], dtype=np.float64)
+        self.created_at = np.array([d["createdAt"].timestamp() for d in docs], dtype=np.float64)
+        # Per-post content score for users the model does not know
+        self.cold_start = cold_start_scores(
+            self.author,
+            self.category,
+            [d.get("hashtags", []) for d in docs],
+            self.like_count + self.comment_count * 2 + self.share_count * 3,
+        )
+
+    def __len__(self):
+        return len(self.docs)
+
+    def subset(self, indices):
+        """PostColumns for the rows at `indices`, slicing the arrays instead of re-reading docs."""
+        sub = PostColumns.__new__(PostColumns)
+        sub.docs = [self.docs[i] for i in indices]
+        sub.post_ids = [self.post_ids[i] for i in indices]
+        for name in COLUMNS:
+            setattr(sub, name, getattr(self, name)[indices])
+        return sub
+
+
+COLUMNS = (
+    "ids", "author", "category", "like_count", "comment_count", "share_count", "created_at", "cold_start"
+)
+
+
+class CandidatePool(PostColumns):
+    """
+    Recent public posts held in memory as columnar arrays.
+
+    The 5-day public candidate set is the same for every user and changes
+    slowly, so it is loaded once per refresh and per-user feeds are built by
+    masking it instead of querying Mongo per request.
+    """
+
+    def __init__(self, docs, epoch=0):
+        super().__init__(docs)
+        self.epoch = epoch
+        self.loaded_at = datetime.now()
+
+        # Precomputed orderings matching the Mongo sorts they replace
+        self.orders = {
+            ("createdAt", -1): np.argsort(-self.created_at, kind="stable"),
+            ("likeCount", -1): np.lexsort((-self.created_at, -self.like_count)),
+        }
+
+        # Sorted ids to locate seen posts by binary search, and integer codes for
+        # authors/categories so per-user membership is a table gather
+        self.id_order = np.argsort(self.ids)
+        self.sorted_ids = self.ids[self.id_order]
+        self.authors, self.author_codes = np.unique(self.author, return_inverse=True)
+        self.categories, self.category_codes = np.unique(self.category, return_inverse=True)
+        self._ann_index = None
+
+    def _member(self, values, codes, ids):
+        """True where the post's author/category code is one of `ids`."""
+        flags = np.zeros(len(values), dtype=bool)
+        flags[locate(values, binary_ids(ids))] = True
+        return flags[codes]
+
+    def mask(self, seen=None, exclude_author=None, authors=None, categories=None):
+        """
+        Boolean mask of eligible posts.
+
+        authors and categories are OR'ed together (followed authors or
+        interest categories); seen posts and exclude_author are removed.
+        """
+        mask = self.created_at >= (datetime.now() - timedelta(days=WINDOW_DAYS)).timestamp()
+
+        if authors is not None or categories is not None:
+            match = np.zeros(len(self), dtype=bool)
+            if authors:
+                match |= self._member(self.authors, self.author_codes, authors)
+            if categories:
+                match |= self._member(self.categories, self.category_codes, categories)
+            mask &= match
+
+        if exclude_author is not None:
+            mask &= self.author != exclude_author.binary
+        if seen is not None and len(seen):
+            # Binary-search the seen ids in the pool: cost follows the history, not the pool
+            mask[self.id_order[locate(self.sorted_ids, seen.ids)]] = False
+        return mask
+
+    def find(self, post_ids):
+        """Pool indices of the posts in `post_ids` that are in the pool, in the given order."""
+        wanted = np.array([ObjectId(p).binary for p in post_ids if ObjectId.is_valid(p)], dtype="S12")
+        return self.id_order[locate(self.sorted_ids, wanted)]
+
+    def ann_index(self, model):
+        """
+        (the model's ANN index narrowed to the pool posts it knows, pool row of
+        each indexed post); cached until the model changes.
+        """
+        cached = self._ann_index
+        if cached is None or cached[0] is not model:
+            post_idx = model.posts.lookup(self.post_ids)
+            indexed = np.flatnonzero(post_idx >= 0)
+            cached = self._ann_index = (model, model.index.subset(post_idx[indexed]), indexed)
+        return cached[1], cached[2]
+
+    def retrieve(self, model, user_id, mask, count):
+        """Pool indices of the model's ANN top `count` posts for the user among `mask`."""
+        index, indexed = self.ann_index(model)
+        return indexed[model.retrieve(user_id, count, mask[indexed], index)]
+
+    def take(self, mask, count, minimum, sort=("createdAt", -1)):
+        """Pool indices with the same recent-first selection as fetch_candidates()."""
+        order = self.orders[sort]
+        selected = order[mask[order]]
+        is_recent = self.created_at[selected] >= (datetime.now() - timedelta(days=RECENT_DAYS)).timestamp()
+
+        recent = selected[is_recent][:count]
+        if len(recent) < minimum:
+            return np.concatenate([recent, selected[~is_recent][:count]])
+        return recent
+
+
+def binary_ids(ids):
+    return np.array([oid.binary for oid in ids], dtype="S12")
+
+
+def locate(sorted_values, wanted):
+    """Positions in sorted_values of the elements of `wanted` that are present."""
+    pos = np.searchsorted(sorted_values, wanted)
+    found = pos < len(sorted_values)
+    pos = pos[found]
+    return pos[sorted_values[pos] == wanted[found]]
+
+
+def timeline_candidates(pool, user, seen, limit):
+    """Unseen posts by followed authors or in interest categories, newest first."""
+    mask = pool.mask(seen=seen, authors=user.get("following", []), categories=user.get("interests", []))
+    return pool.subset(pool.take(mask, limit * 2, limit, sort=("createdAt", -1)))
+
+
+def explore_candidates(pool, user, seen, limit, model=None, sort=("likeCount", -1), trending=()):
+    """
+    Unseen posts by anyone but the user, most liked first.
+
+    Eligible posts among `trending` (post ids, hottest first) lead the list,
+    so fast-rising posts compete with ones that piled up likes over days.
+    With a retrieval model (one that has an ANN index), the user's nearest
+    posts from the whole pool are appended, so the model is not limited to
+    what is already popular.
+    """
+    mask = pool.mask(seen=seen, exclude_author=user["_id"])
+    picked = pool.take(mask, limit * 3, limit, sort=sort)
+    if len(trending):
+        rising = pool.find(trending)
+        rising = rising[mask[rising]][:limit]
+        picked = np.concatenate([rising, picked[~np.isin(picked, rising)]])
+    if model is not None and model.trained and hasattr(model, "retrieve"):
+        nearest = pool.retrieve(model, str(user["_id"]), mask, limit)
+        picked = np.concatenate([picked, nearest[~np.isin(nearest, picked)]])
+    return pool.subset(picked)
+
+
+def candidate_pool_cursor(db, max_posts=CANDIDATE_POOL_MAX, query=None):
+    """
+    Public posts of the last WINDOW_DAYS days, newest first and capped; works with either driver.
+
+    `query` narrows the pool, e.g. to the candidates of a few users.
+    """
+    return db.posts.find(
+        {"visibility": "public", **get_time_filtered_query(WINDOW_DAYS), **(query or {})}, POST_PROJECTION
+    ).sort("createdAt", -1).limit(max_posts).batch_size(5000)
+
+
+async def load_candidate_pool(db, epoch=0, max_posts=CANDIDATE_POOL_MAX, query=None):
+    return CandidatePool(await candidate_pool_cursor(db, max_posts, query).to_list(None), epoch)
+
+
+def load_candidate_pool_sync(db, epoch=0, max_posts=CANDIDATE_POOL_MAX):
+    """Blocking variant for worker processes and threads, so building the arrays stays off the event loop."""
+    return CandidatePool(list(candidate_pool_cursor(db, max_posts)), epoch)
@@ -0,0 +1,30 @@
+from pymongo import AsyncMongoClient, MongoClient
+import os
+
+MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+MONGO_INITDB_DATABASE = os.getenv("MONGO_INITDB_DATABASE", "your_database_name")
+
+# Connection pool sizing per worker process
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_CONNECTING = int(os.getenv("MONGO_MAX_CONNECTING", "2"))
+
+
+def pool_options():
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxConnecting": MONGO_MAX_CONNECTING,
+    }
+
+
+def connect_async():
+    """Client for the request path; all calls are awaited on the event loop."""
+    client = AsyncMongoClient(MONGODB_URI, **pool_options())
+    return client, client[MONGO_INITDB_DATABASE]
+
+
+def connect_sync():
+    """Blocking client for training and other work that runs off the event loop."""
+    client = MongoClient(MONGODB_URI, **pool_options())
+    return client, client[MONGO_INITDB_DATABASE]
@@ -0,0 +1,175 @@
+from array import array
+import os
+
+import numpy as np
+from pymongo import UpdateOne
+
+from app.model import Interactions, Vocabulary
+from app.utils import oid_str
+
+# Documents fetched per cursor round-trip while streaming training data
+EXTRACT_BATCH_SIZE = int(os.getenv("EXTRACT_BATCH_SIZE", "5000"))
+# Seen posts per history pulled by an incremental update; new ones are appended last
+INCREMENTAL_SEEN_TAIL = int(os.getenv("INCREMENTAL_SEEN_TAIL", "200"))
+# Likers per post and last seen id per user already fed to incremental updates
+INCREMENTAL_MARKS = "incremental_marks"
+
+
+def pair_keys(user_idx, post_idx):
+    """Pack (user, post) index pairs into one int64 so pairs can be compared as scalars."""
+    return (np.asarray(user_idx, dtype=np.int64) << 32) | np.asarray(post_idx, dtype=np.int64)
+
+
+def sample_negatives(user_pool, post_pool, positive_keys, count, seed=42, max_rounds=10):
+    """
+    Draw `count` distinct (user, post) pairs from the pools that are not positives.
+
+    Sampling is vectorized: each round draws a batch of random pairs, drops
+    the ones found among the positive keys and deduplicates, so the cost
+    does not depend on users x posts.
+    """
+    if count <= 0 or len(user_pool) == 0 or len(post_pool) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    chosen = np.empty(0, dtype=np.int64)
+
+    for _ in range(max_rounds):
+        needed = count - len(chosen)
+        if needed <= 0:
+            break
+        draw = needed * 2
+        keys = pair_keys(rng.choice(user_pool, draw), rng.choice(post_pool, draw))
+        keys = keys[~np.isin(keys, positive_keys)]
+        chosen = np.unique(np.concatenate([chosen, keys]))
+
+    # np.unique sorts, so shuffle before trimming to avoid favouring low indices
+    chosen = rng.permutation(chosen)[:count]
+    return chosen >> 32, chosen & 0xFFFFFFFF
+
+
+def extract_interactions(db, batch_size=EXTRACT_BATCH_SIZE, negative_ratio=0.5):
+    """
+    Stream training interactions out of Mongo into columnar arrays.
+
+    Positives are every (liker, post) pair on liked posts; negatives are
+    sampled from all users x public posts, excluding liked pairs, at
+    `negative_ratio` of the positive count. Cursors are read in batches with
+    projections, so memory is bounded by the index arrays, not the documents.
+    """
+    users = Vocabulary()
+    posts = Vocabulary()
+    user_idx = array("q")
+    post_idx = array("q")
+
+    # Collect positive interactions from likes
+    liked = db.posts.find({"likeCount": {"$gt": 0}}, {"_id": 1, "likes": 1}, batch_size=batch_size)
+    for post in liked:
+        likes = [oid_str(uid) for uid in post.get("likes", [])]
+        if not likes:
+            continue
+        posts.add([oid_str(post["_id"])])
+        users.add(likes)
+        user_idx.extend(users.lookup(likes))
+        post_idx.extend([len(posts) - 1] * len(likes))
+
+    pos_users = np.frombuffer(user_idx, dtype=np.int64)
+    pos_posts = np.frombuffer(post_idx, dtype=np.int64)
+
+    # Candidate pools for negatives: any user against any public post
+    user_pool = array("q")
+    for user in db.users.find({}, {"_id": 1}, batch_size=batch_size):
+        uid = oid_str(user["_id"])
+        users.add([uid])
+        user_pool.append(users.index[uid])
+
+    post_pool = array("q")
+    for post in db.posts.find({"visibility": "public"}, {"_id": 1}, batch_size=batch_size):
+        pid = oid_str(post["_id"])
+        posts.add([pid])
+        post_pool.append(posts.index[pid])
+
+    neg_users, neg_posts = sample_negatives(
+        np.frombuffer(user_pool, dtype=np.int64),
+        np.frombuffer(post_pool, dtype=np.int64),
+        pair_keys(pos_users, pos_posts),
+        int(len(pos_users) * negative_ratio),
+    )
+
+    return Interactions(
+        users,
+        posts,
+        np.concatenate([pos_users, neg_users]),
+        np.concatenate([pos_posts, neg_posts]),
+        np.concatenate([np.ones(len(pos_users), dtype=np.int64), np.zeros(len(neg_users), dtype=np.int64)]),
+    )
+
+
+def mark_key(kind, _id):
+    return f"{kind}:{oid_str(_id)}"
+
+
+def get_interactions_since(db, since):
+    """
+    Derive the interactions that happened after `since` from Mongo.
+
+    Returns (interactions, marks). Neither likes nor seen posts carry a
+    timestamp, so INCREMENTAL_MARKS records what earlier updates consumed:
+    the likers of each post and the last seen id of each history. Likes not
+    in a post's mark become positives; seen ids appended after a user's mark
+    become negatives unless the user has liked the post. Posts and users
+    without a mark contribute all their likes or their last
+    INCREMENTAL_SEEN_TAIL seen ids once. Pass `marks` to save_marks() after
+    the update is applied.
+    """
+    interactions = []
+    marks = []
+
+    posts = list(db.posts.find({"updatedAt": {"$gte": since}}, {"_id": 1, "likes": 1}))
+    consumed = {
+        mark["_id"]: set(mark.get("likes", []))
+        for mark in db[INCREMENTAL_MARKS].find({"_id": {"$in": [mark_key("likes", p["_id"]) for p in posts]}})
+    }
+    for post in posts:
+        key = mark_key("likes", post["_id"])
+        likes = post.get("likes", [])
+        previous = consumed.get(key, set())
+        new_likes = [uid for uid in likes if uid not in previous]
+        for uid in new_likes:
+            interactions.append({"user_id": oid_str(uid), "post_id": oid_str(post["_id"]), "label": 1})
+        if new_likes or len(likes) != len(previous):
+            marks.append(UpdateOne({"_id": key}, {"$set": {"likes": likes}}, upsert=True))
+
+    histories = list(db.userposthistories.find(
+        {"lastUpdated": {"$gte": since}},
+        {"user": 1, "seenPosts": {"$slice": -INCREMENTAL_SEEN_TAIL}}
+    ))
+    last_seen = {
+        mark["_id"]: mark.get("last")
+        for mark in db[INCREMENTAL_MARKS].find({"_id": {"$in": [mark_key("seen", h["user"]) for h in histories]}})
+    }
+    for history in histories:
+        key = mark_key("seen", history["user"])
+        tail = history.get("seenPosts", [])
+        # seenPosts is append-only and free of duplicates, so ids after the mark are new
+        last = last_seen.get(key)
+        new_ids = tail[tail.index(last) + 1:] if last in tail else tail
+        if not new_ids:
+            continue
+        liked = {
+            post["_id"]
+            for post in db.posts.find({"_id": {"$in": new_ids}, "likes": history["user"]}, {"_id": 1})
+        }
+        user_id = oid_str(history["user"])
+        for pid in new_ids:
+            if pid not in liked:
+                interactions.append({"user_id": user_id, "post_id": oid_str(pid), "label": 0})
+        marks.append(UpdateOne({"_id": key}, {"$set": {"last": tail[-1]}}, upsert=True))
+
+    return interactions, marks
+
+
+def save_marks(db, marks):
+    """Record the events of an applied incremental update as consumed."""
+    if marks:
+        db[INCREMENTAL_MARKS].bulk_write(marks, ordered=False)
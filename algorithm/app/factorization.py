@@ -0,0 +1,353 @@
+import numpy as np
+import scipy.sparse as sp
+from datetime import datetime
+import json
+import logging
+import os
+import time
+import tracemalloc
+
+from app.model import Interactions, Vocabulary, cold_start_fallback
+from app.scoring import top_k
+
+# Implicit ALS hyperparameters (Hu, Koren & Volinsky confidence weighting)
+ALS_FACTORS = int(os.getenv("ALS_FACTORS", "32"))
+ALS_ITERATIONS = int(os.getenv("ALS_ITERATIONS", "10"))
+ALS_REGULARIZATION = float(os.getenv("ALS_REGULARIZATION", "0.1"))
+ALS_ALPHA = float(os.getenv("ALS_ALPHA", "20"))
+
+# IVF index: number of k-means lists (0 picks sqrt of the post count) and lists scanned per query
+ANN_LISTS = int(os.getenv("ANN_LISTS", "0"))
+ANN_PROBES = int(os.getenv("ANN_PROBES", "8"))
+
+
+def implicit_als(likes, factors=ALS_FACTORS, iterations=ALS_ITERATIONS,
+                 regularization=ALS_REGULARIZATION, alpha=ALS_ALPHA, seed=42):
+    """
+    Factorize a users x posts like matrix into user and post embeddings.
+
+    Every like is an observation with confidence 1 + alpha; all other cells
+    are weak negatives. Alternates exact least-squares solves for one side
+    while the other is held fixed.
+    """
+    rng = np.random.default_rng(seed)
+    n_users, n_posts = likes.shape
+    user_factors = rng.normal(scale=0.01, size=(n_users, factors))
+    post_factors = rng.normal(scale=0.01, size=(n_posts, factors))
+    likes = likes.tocsr()
+    likes_t = likes.T.tocsr()
+
+    for _ in range(iterations):
+        user_factors = _als_step(likes, post_factors, regularization, alpha)
+        post_factors = _als_step(likes_t, user_factors, regularization, alpha)
+    return user_factors.astype(np.float32), post_factors.astype(np.float32)
+
+
+def _als_step(likes, fixed, regularization, alpha):
+    """Solve each row's factors against the fixed side; YtY is shared by all rows."""
+    factors = fixed.shape[1]
+    gram = fixed.T @ fixed + regularization * np.eye(factors)
+    solved = np.zeros((likes.shape[0], factors))
+    for row in range(likes.shape[0]):
+        start, end = likes.indptr[row], likes.indptr[row + 1]
+        if start == end:
+            continue
+        liked = fixed[likes.indices[start:end]]
+        confidence = 1.0 + alpha * likes.data[start:end]
+        # (YtY + Yu^T (Cu - I) Yu + reg I) x = Yu^T Cu p(u), with p = 1 on likes
+        solved[row] = np.linalg.solve(gram + (liked.T * (confidence - 1.0)) @ liked, liked.T @ confidence)
+    return solved
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over post embeddings for inner-product search.
+
+    Posts are grouped by their nearest k-means centroid; a query scores only
+    the posts in its `n_probe` best lists, so retrieval cost grows with the
+    list size rather than the corpus.
+    """
+
+    def __init__(self, vectors, centroids, offsets, items):
+        self.vectors = vectors
+        self.centroids = centroids
+        # Posts of list i are items[offsets[i]:offsets[i + 1]]
+        self.offsets = offsets
+        self.items = items
+        self._assignment = None
+
+    @classmethod
+    def build(cls, vectors, n_lists=ANN_LISTS, iterations=10, seed=42):
+        n = len(vectors)
+        n_lists = min(n_lists or max(int(np.sqrt(n)), 1), max(n, 1))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n, n_lists, replace=False)] if n else np.zeros((0, vectors.shape[1]))
+
+        assignment = np.zeros(n, dtype=np.int64)
+        for _ in range(iterations if n else 0):
+            assignment = nearest_centroid(vectors, centroids)
+            counts = np.bincount(assignment, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, vectors)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+
+        items = np.argsort(assignment, kind="stable")
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=n_lists), out=offsets[1:])
+        return cls(vectors, centroids.astype(np.float32), offsets, items)
+
+    def search(self, query, k, n_probe=ANN_PROBES, allowed=None):
+        """
+        Indices of up to `k` vectors with the highest inner product with `query`, best first.
+
+        `allowed` is an optional boolean mask over the vectors. Probing widens
+        until k allowed vectors were seen or every list was scanned.
+        """
+        n_lists = len(self.centroids)
+        if not n_lists or k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        lists = np.argsort(-(self.centroids @ query))
+        n_probe = min(max(n_probe, 1), n_lists)
+        while True:
+            probed = np.concatenate([self.items[self.offsets[i]:self.offsets[i + 1]] for i in lists[:n_probe]])
+            if allowed is not None:
+                probed = probed[allowed[probed]]
+            if len(probed) >= k or n_probe == n_lists:
+                break
+            n_probe = min(n_probe * 2, n_lists)
+
+        return probed[top_k(self.vectors[probed] @ query, k)]
+
+    def assignment(self):
+        """List of every vector, derived from the inverted lists once."""
+        if self._assignment is None:
+            assignment = np.empty(len(self.items), dtype=np.int64)
+            assignment[self.items] = np.repeat(np.arange(len(self.centroids)), np.diff(self.offsets))
+            self._assignment = assignment
+        return self._assignment
+
+    def subset(self, ids):
+        """
+        Index over only the vectors `ids`, keeping their lists; its results are positions in `ids`.
+
+        Searching the subset probes only lists holding those vectors' members,
+        so restricting retrieval to a small eligible set costs no more than
+        the set itself.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        lists = self.assignment()[ids]
+        offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(lists, minlength=len(self.centroids)), out=offsets[1:])
+        return IVFIndex(np.asarray(self.vectors[ids]), self.centroids, offsets, np.argsort(lists, kind="stable"))
+
+    def save(self, path):
+        np.save(os.path.join(path, "ivf_centroids.npy"), self.centroids)
+        np.save(os.path.join(path, "ivf_offsets.npy"), self.offsets)
+        np.save(os.path.join(path, "ivf_items.npy"), self.items)
+
+    @classmethod
+    def load(cls, path, vectors, mmap_mode=None):
+        return cls(
+            vectors,
+            np.load(os.path.join(path, "ivf_centroids.npy")),
+            np.load(os.path.join(path, "ivf_offsets.npy")),
+            np.load(os.path.join(path, "ivf_items.npy"), mmap_mode=mmap_mode),
+        )
+
+
+def nearest_centroid(vectors, centroids, chunk=65536):
+    """Index of the closest centroid (euclidean) for every vector, computed in chunks."""
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    norms = (centroids ** 2).sum(axis=1)
+    for start in range(0, len(vectors), chunk):
+        block = vectors[start:start + chunk]
+        assignment[start:start + chunk] = np.argmin(norms[None, :] - 2 * block @ centroids.T, axis=1)
+    return assignment
+
+
+class FactorizationModel:
+    """
+    Implicit-feedback matrix factorization with an ANN index over post embeddings.
+
+    Drop-in for RecommendationModel on the serving side (predict,
+    predict_many, save/load) plus retrieve(), which returns a user's best
+    posts from the whole corpus without scoring every candidate.
+    """
+
+    mode = "als"
+
+    def __init__(self):
+        self.users = Vocabulary()
+        self.posts = Vocabulary()
+        self.user_factors = np.zeros((0, ALS_FACTORS), dtype=np.float32)
+        self.post_factors = np.zeros((0, ALS_FACTORS), dtype=np.float32)
+        self.index = None
+        self.trained = False
+        self.training_metrics = {}
+        self.checkpoint = None
+        self.version = None
+
+    def train(self, interactions):
+        """Fit embeddings on the liked (label 1) pairs of `interactions` and index the posts."""
+        if not isinstance(interactions, Interactions):
+            interactions = Interactions.from_records(interactions or [])
+
+        if interactions.positives < 10:
+            logging.warning("Insufficient training data provided")
+            return False
+
+        own_trace = False
+        try:
+            own_trace = not tracemalloc.is_tracing()
+            if own_trace:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            started = time.perf_counter()
+
+            liked = interactions.labels == 1
+            likes = sp.csr_matrix(
+                (np.ones(int(liked.sum())), (interactions.user_idx[liked], interactions.post_idx[liked])),
+                shape=(len(interactions.users), len(interactions.posts))
+            )
+            likes.sum_duplicates()
+            likes.data[:] = 1.0
+            # Users and posts without a like would keep all-zero factors; leaving them
+            # out of the vocabularies makes them unknown, so they get cold-start scores
+            # and stay out of the ANN index
+            liking = np.flatnonzero(np.diff(likes.indptr))
+            liked_posts = np.flatnonzero(np.bincount(likes.indices, minlength=likes.shape[1]))
+            likes = likes[liking][:, liked_posts]
+            users = Vocabulary([interactions.users.ids[i] for i in liking])
+            posts = Vocabulary([interactions.posts.ids[i] for i in liked_posts])
+
+            user_factors, post_factors = implicit_als(likes)
+            fit_time = time.perf_counter() - started
+            index = IVFIndex.build(post_factors)
+            index_time = time.perf_counter() - started - fit_time
+
+            _, peak = tracemalloc.get_traced_memory()
+            if own_trace:
+                tracemalloc.stop()
+
+            self.users, self.posts = users, posts
+            self.user_factors, self.post_factors, self.index = user_factors, post_factors, index
+            self.training_metrics = {
+                "training_samples": len(interactions),
+                "positive_samples": interactions.positives,
+                "factors": int(user_factors.shape[1]),
+                "ann_lists": len(index.centroids),
+                "fit_time_seconds": round(fit_time, 4),
+                "index_time_seconds": round(index_time, 4),
+                "peak_memory_mb": round(peak / (1024 * 1024), 2),
+                "feature_nnz": int(likes.nnz),
+            }
+            self.trained = True
+            return True
+
+        except Exception as e:
+            if own_trace and tracemalloc.is_tracing():
+                tracemalloc.stop()
+            logging.error(f"Training failed: {str(e)}")
+            return False
+
+    def partial_train(self, interactions):
+        logging.warning("Incremental updates are not supported in factorization mode; run /train")
+        return False
+
+    def predict(self, user_id, post_ids, cold_start=None):
+        """
+        Like scores for post_ids. Users the model has not seen get `cold_start`
+        (per-post content scores) when given, otherwise a flat 0.2.
+        """
+        if not self.trained or not post_ids:
+            return [0.1] * len(post_ids)  # Return low default scores
+
+        try:
+            user_idx = self.users.index.get(user_id, -1)
+            if user_idx < 0:
+                return cold_start_fallback(cold_start, len(post_ids))
+            return self.predict_many([user_id], post_ids)[0]
+
+        except Exception as e:
+            logging.error(f"Prediction failed: {str(e)}")
+            return [0.2] * len(post_ids)
+
+    def predict_many(self, user_ids, post_ids, cold_start=None):
+        """Score matrix (users x posts): embedding dot products clipped to [0, 1]."""
+        shape = (len(user_ids), len(post_ids))
+        if not self.trained or not post_ids:
+            return np.full(shape, 0.1)
+
+        try:
+            user_idx = self.users.lookup(user_ids)
+            post_idx = self.posts.lookup(post_ids)
+            scores = self.user_factors[user_idx] @ self.post_factors[post_idx].T
+            # Unknown posts have no embedding
+            scores[:, post_idx < 0] = 0.0
+            scores = np.clip(scores, 0.0, 1.0).astype(np.float64)
+            unknown = user_idx < 0
+            if unknown.any():
+                scores[unknown] = cold_start_fallback(cold_start, len(post_ids))
+            return scores
+
+        except Exception as e:
+            logging.error(f"Prediction failed: {str(e)}")
+            return np.full(shape, 0.2)
+
+    def retrieve(self, user_id, k, allowed=None, index=None):
+        """
+        Indices of the user's top-k posts from the ANN index; empty if unknown.
+
+        Indices are into self.posts, or into the vectors of `index` when a
+        subset index (see IVFIndex.subset) is given.
+        """
+        user_idx = self.users.index.get(user_id, -1)
+        if not self.trained or user_idx < 0:
+            return np.empty(0, dtype=np.int64)
+        return (index if index is not None else self.index).search(self.user_factors[user_idx], k, allowed=allowed)
+
+    def save(self, path):
+        """Write embeddings, the ANN index, vocabularies and metrics into directory `path`."""
+        if not self.trained:
+            raise ValueError("Cannot save an untrained model")
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "user_factors.npy"), self.user_factors)
+        np.save(os.path.join(path, "post_factors.npy"), self.post_factors)
+        np.save(os.path.join(path, "user_ids.npy"), np.array(self.users.ids, dtype=str))
+        np.save(os.path.join(path, "post_ids.npy"), np.array(self.posts.ids, dtype=str))
+        self.index.save(path)
+
+        meta = {
+            "mode": self.mode,
+            "checkpoint": self.checkpoint.isoformat() if self.checkpoint else None,
+            "training_metrics": self.training_metrics,
+            "saved_at": datetime.now().isoformat(),
+        }
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Restore a model written by save(); embeddings are memory-mapped unless mmap is False."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+
+        mmap_mode = "r" if mmap else None
+        instance = cls()
+        instance.user_factors = np.load(os.path.join(path, "user_factors.npy"), mmap_mode=mmap_mode)
+        instance.post_factors = np.load(os.path.join(path, "post_factors.npy"), mmap_mode=mmap_mode)
+        instance.index = IVFIndex.load(path, instance.post_factors, mmap_mode)
+        instance.users = Vocabulary(np.load(os.path.join(path, "user_ids.npy"), mmap_mode=mmap_mode).tolist())
+        instance.posts = Vocabulary(np.load(os.path.join(path, "post_ids.npy"), mmap_mode=mmap_mode).tolist())
+        instance.training_metrics = meta.get("training_metrics", {})
+        if meta.get("checkpoint"):
+            instance.checkpoint = datetime.fromisoformat(meta["checkpoint"])
+        instance.trained = True
+        return instance
+
+    def get_training_metrics(self):
+        """Return training metrics if available."""
+        return self.training_metrics
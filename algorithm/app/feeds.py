@@ -0,0 +1,256 @@
+"""
+Materialized timeline and explore feeds.
+
+Refresh workers rank feeds for recently active users ahead of time and store
+them in the recommended_feeds collection, one document per (kind, user). The
+request path then reads a single document by _id and only falls back to live
+ranking when the stored feed is missing, stale or runs short after removing
+posts seen since it was generated.
+
+Run a refresh with `python -m app.feeds --once`, or without --once to keep
+refreshing every FEED_REFRESH_INTERVAL seconds.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+
+from bson import ObjectId
+import numpy as np
+from pymongo import ReplaceOne
+
+from app import artifacts
+from app.candidates import explore_candidates, load_candidate_pool_sync, timeline_candidates
+from app.database import connect_sync
+from app.scoring import explore_engagement, model_scores, rank_timeline, top_k
+from app.seen_cache import EMPTY, SeenSet, seen_set
+from app.utils import post_summary
+
+FEEDS_COLLECTION = "recommended_feeds"
+
+# Posts stored per feed; requests for more than this are served live
+FEED_SIZE = int(os.getenv("FEED_SIZE", "100"))
+# Seconds a stored feed is served before falling back to live ranking
+FEED_MAX_AGE = float(os.getenv("FEED_MAX_AGE", "900"))
+FEED_WORKERS = int(os.getenv("FEED_WORKERS", str(os.cpu_count() or 1)))
+# Users ranked per worker task (one $in read and one bulk write each)
+FEED_CHUNK = int(os.getenv("FEED_CHUNK", "500"))
+# Only users whose history changed this recently get a materialized feed
+FEED_ACTIVE_DAYS = int(os.getenv("FEED_ACTIVE_DAYS", "7"))
+# Seconds between refreshes; 0 leaves refreshing to `python -m app.feeds`
+FEED_REFRESH_INTERVAL = float(os.getenv("FEED_REFRESH_INTERVAL", "0"))
+# Whether requests read stored feeds at all; set to 1 when only `python -m app.feeds` refreshes them
+FEED_MATERIALIZED = os.getenv("FEED_MATERIALIZED", "1" if FEED_REFRESH_INTERVAL > 0 else "0") == "1"
+
+FEED_KINDS = ("timeline", "explore")
+
+
+def feed_key(kind, user_id):
+    return f"{kind}:{user_id}"
+
+
+async def load_feed(db, kind, user_id):
+    """The stored feed document, or None."""
+    try:
+        return await db[FEEDS_COLLECTION].find_one({"_id": feed_key(kind, user_id)})
+    except Exception as e:
+        logging.error(f"Error fetching stored feed: {e}")
+        return None
+
+
+def unseen_rows(stored, seen, limit, model_version):
+    """
+    Indices of the stored feed's posts the user has not seen, or None when it cannot be served.
+
+    A feed is unusable when it is older than FEED_MAX_AGE, was ranked by a
+    different model version, or does not hold every candidate and has fewer
+    than `limit` posts left once posts seen since it was generated are removed.
+    """
+    if not stored or stored.get("model_version") != model_version or limit > FEED_SIZE:
+        return None
+    if datetime.now() - stored["generated_at"] > timedelta(seconds=FEED_MAX_AGE):
+        return None
+
+    posts = stored["posts"]
+    ids = np.array([ObjectId(p["post_id"]).binary for p in posts], dtype="S12")
+    rows = np.flatnonzero(~seen.contains(ids))
+    # Feeds written before the flag existed were complete when shorter than FEED_SIZE
+    complete = stored.get("complete", len(posts) < FEED_SIZE)
+    if len(rows) < limit and not complete:
+        return None
+    return rows
+
+
+def fresh_posts(stored, seen, limit, model_version):
+    """Up to `limit` unseen posts of a stored (ranked) timeline, or None when it cannot be served."""
+    rows = unseen_rows(stored, seen, limit, model_version)
+    if rows is None:
+        return None
+    return [stored["posts"][i] for i in rows[:limit]]
+
+
+class StoredPosts:
+    """Post summaries of a stored feed with the columns rank_explore() reads."""
+
+    def __init__(self, posts):
+        self.docs = posts
+        self.post_ids = [p["post_id"] for p in posts]
+        self.like_count = np.array([p.get("likeCount", 0) for p in posts], dtype=np.float64)
+        self.comment_count = np.array([p.get("commentCount", 0) for p in posts], dtype=np.float64)
+        self.share_count = np.array([p.get("shareCount", 0) for p in posts], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.docs)
+
+
+def stored_explore(stored, seen, limit, model_version):
+    """
+    (candidates, model scores) of a stored explore feed, or None when it cannot be served.
+
+    Explore mixes model and engagement picks in proportions that depend on
+    the limit, so it is stored unranked and ranked per request.
+    """
+    rows = unseen_rows(stored, seen, limit, model_version)
+    if rows is None:
+        return None
+    scores = stored.get("scores")
+    return (
+        StoredPosts([stored["posts"][i] for i in rows]),
+        np.asarray(scores, dtype=np.float64)[rows] if scores is not None else None,
+    )
+
+
+def explore_feed(candidates, scores, size=FEED_SIZE):
+    """
+    Indices of the explore candidates worth storing: the `size` best by model
+    score and the `size` most engaging, which covers rank_explore() for any
+    limit up to `size`.
+    """
+    keep = top_k(explore_engagement(candidates), size)
+    if scores is not None:
+        keep = np.concatenate([top_k(scores, size), keep])
+    # Candidate order, so ties break the same way as when ranking live
+    return np.unique(keep)
+
+
+def active_user_ids(db, days=FEED_ACTIVE_DAYS):
+    """Users whose seen history was updated in the last `days` days."""
+    since = datetime.now() - timedelta(days=days)
+    return [h["user"] for h in db.userposthistories.find({"lastUpdated": {"$gte": since}}, {"user": 1})]
+
+
+# Per-process state of a refresh worker, set up once by _init_worker()
+_worker = {}
+
+
+def _init_worker():
+    client, db = connect_sync()
+    _worker["client"] = client
+    _worker["db"] = db
+    _worker["model"] = artifacts.load_version() or artifacts.new_model()
+    _worker["pool"] = load_candidate_pool_sync(db)
+
+
+def _refresh_chunk(user_ids, size=FEED_SIZE):
+    """Rank and store both feeds for `user_ids`; returns the number of users written."""
+    db, model, pool = _worker["db"], _worker["model"], _worker["pool"]
+    users = list(db.users.find({"_id": {"$in": user_ids}}, {"following": 1, "interests": 1}))
+    seen = {
+        h["user"]: seen_set(h)
+        for h in db.userposthistories.find({"user": {"$in": user_ids}}, {"user": 1, "seenPosts": 1})
+    }
+
+    now = datetime.now()
+    writes = []
+    for user in users:
+        user_id = str(user["_id"])
+        user_seen = seen.get(user["_id"], SeenSet(EMPTY))
+        timeline = timeline_candidates(pool, user, user_seen, size)
+        explore = explore_candidates(pool, user, user_seen, size, model)
+        timeline_scores = model_scores(model, user_id, timeline)
+        explore_scores = model_scores(model, user_id, explore)
+        explore_rows = explore_feed(explore, explore_scores, size)
+        ranked_timeline = rank_timeline(timeline, timeline_scores, size, now.timestamp())
+        # Complete: every candidate is stored, so running short after seen-filtering is fine
+        feeds = {
+            "timeline": {
+                "posts": [post_summary(p) for p in ranked_timeline],
+                "complete": len(timeline) <= size,
+            },
+            "explore": {
+                "posts": [post_summary(explore.docs[i]) for i in explore_rows],
+                "scores": explore_scores[explore_rows].tolist() if explore_scores is not None else None,
+                "complete": len(explore_rows) == len(explore) < size * 3,
+            },
+        }
+        for kind in FEED_KINDS:
+            writes.append(ReplaceOne(
+                {"_id": feed_key(kind, user_id)},
+                {
+                    "user": user["_id"],
+                    "kind": kind,
+                    **feeds[kind],
+                    "generated_at": now,
+                    "model_version": model.version,
+                },
+                upsert=True
+            ))
+
+    if writes:
+        db[FEEDS_COLLECTION].bulk_write(writes, ordered=False)
+    return len(users)
+
+
+def refresh_feeds(workers=FEED_WORKERS, chunk=FEED_CHUNK):
+    """
+    Re-rank the feeds of all active users across a pool of worker processes.
+
+    Each worker loads the current model artifact and the candidate pool once,
+    then ranks chunks of users independently, so ranking scales with cores
+    instead of competing with request handling for the GIL.
+    """
+    started = time.monotonic()
+    client, db = connect_sync()
+    try:
+        user_ids = active_user_ids(db)
+    finally:
+        client.close()
+
+    chunks = [user_ids[i:i + chunk] for i in range(0, len(user_ids), chunk)]
+    if not chunks:
+        return {"users": 0, "seconds": 0.0}
+
+    # spawn: forked children must not inherit the parent's Mongo client
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context,
+                             initializer=_init_worker) as executor:
+        written = sum(executor.map(_refresh_chunk, chunks))
+
+    seconds = time.monotonic() - started
+    logging.info(f"Refreshed feeds for {written} users in {seconds:.1f}s")
+    return {"users": written, "seconds": seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh materialized feeds")
+    parser.add_argument("--once", action="store_true", help="refresh once and exit")
+    parser.add_argument("--workers", type=int, default=FEED_WORKERS)
+    parser.add_argument("--interval", type=float, default=FEED_REFRESH_INTERVAL or 300)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    while True:
+        try:
+            refresh_feeds(workers=args.workers)
+        except Exception as e:
+            logging.error(f"Feed refresh failed: {e}")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+
+import numpy as np
+import scipy.sparse as sp
+from pymongo import ASCENDING, IndexModel
+
+from app.model import Vocabulary
+from app.scoring import top_k
+
+# Seconds between incremental follow-graph refreshes
+FOLLOW_GRAPH_REFRESH = float(os.getenv("FOLLOW_GRAPH_REFRESH", "60"))
+# Friend-of-friend candidates (by mutual follows) fetched per request
+FOF_CANDIDATES = int(os.getenv("FOF_CANDIDATES", "100"))
+
+# Users pre-selected by shared interests per request, before their documents are read
+INTEREST_CANDIDATES = int(os.getenv("INTEREST_CANDIDATES", "100"))
+
+# Lets refreshes read only users changed since the last one
+USER_INDEXES = [IndexModel([("updatedAt", ASCENDING)], name="graph_updated")]
+
+
+class FollowGraph:
+    """
+    The follow graph as a CSR adjacency matrix over integer user indices.
+
+    Row u holds the users u follows, so row(u) @ A counts, for every other
+    user, how many of u's followees follow them (mutual follows). Rows are
+    kept per user so an incremental refresh only replaces changed users
+    before the matrix is reassembled.
+
+    Interests are indexed the same way: `members` is the users x categories
+    matrix in CSC form, i.e. a sorted array of user indices per category, so
+    shared-interest counts are a column slice and a row sum.
+    """
+
+    def __init__(self):
+        self.users = Vocabulary()
+        self.following = []
+        self.matrix = sp.csr_matrix((0, 0), dtype=np.int32)
+        self.categories = Vocabulary()
+        self.interests = []
+        self.members = sp.csc_matrix((0, 0), dtype=np.int32)
+        self.follower_counts = []
+        self.follower_count = np.zeros(0)
+        self.updated_at = None
+
+    def __len__(self):
+        return len(self.users)
+
+    def apply(self, docs):
+        """
+        Insert or replace the adjacency rows of user `docs`; returns the number that changed.
+
+        Rows identical to the ones already held are skipped, and the matrices
+        are only reassembled when something changed. Readers only touch the
+        assembled matrices, which are swapped in whole, so this can run in a
+        worker thread while requests are served.
+        """
+        changed = 0
+        for doc in docs:
+            followed = [str(f) for f in doc.get("following", [])]
+            self.users.add([str(doc["_id"])] + followed)
+            missing = len(self.users) - len(self.following)
+            self.following.extend(np.empty(0, dtype=np.int32) for _ in range(missing))
+            self.interests.extend(np.empty(0, dtype=np.int32) for _ in range(missing))
+            self.follower_counts.extend(0 for _ in range(missing))
+            interests = [str(i) for i in doc.get("interests", [])]
+            self.categories.add(interests)
+
+            idx = self.users.index[str(doc["_id"])]
+            row = np.unique(self.users.lookup(followed).astype(np.int32))
+            row_interests = np.unique(self.categories.lookup(interests).astype(np.int32))
+            follower_count = doc.get("followerCount", 0)
+            stamp = doc.get("updatedAt")
+            if stamp and (self.updated_at is None or stamp > self.updated_at):
+                self.updated_at = stamp
+            if (idx < self.matrix.shape[0] and np.array_equal(row, self.following[idx])
+                    and np.array_equal(row_interests, self.interests[idx])
+                    and follower_count == self.follower_counts[idx]):
+                continue
+
+            self.following[idx] = row
+            self.interests[idx] = row_interests
+            self.follower_counts[idx] = follower_count
+            changed += 1
+
+        if changed:
+            self._build()
+        return changed
+
+    def _build(self):
+        n = len(self.users)
+        matrix = adjacency(self.following, n)
+        members = adjacency(self.interests, len(self.categories)).tocsc()
+        # follower_count first: it is never shorter than the members matrix readers index it with
+        self.follower_count = np.array(self.follower_counts, dtype=np.float64)
+        self.members = members
+        self.matrix = matrix
+
+    def friends_of_friends(self, user_id, k=FOF_CANDIDATES):
+        """
+        Up to `k` (user_id, mutual_follows) pairs, most mutual follows first.
+
+        Excludes the user and everyone they already follow.
+        """
+        matrix = self.matrix
+        idx = self.users.index.get(user_id)
+        if idx is None or idx >= matrix.shape[0]:
+            return []
+
+        row = matrix[idx]
+        counts = (row @ matrix).tocsr()
+        candidates, mutual = counts.indices, counts.data
+
+        keep = (candidates != idx) & ~np.isin(candidates, row.indices) & (mutual > 0)
+        candidates, mutual = candidates[keep], mutual[keep]
+        if len(candidates) > k:
+            best = np.argpartition(-mutual, k - 1)[:k]
+            candidates, mutual = candidates[best], mutual[best]
+        order = np.argsort(-mutual, kind="stable")
+        return [(self.users.ids[c], int(m)) for c, m in zip(candidates[order], mutual[order])]
+
+    def similar_interests(self, user_id, interest_ids, exclude=(), k=INTEREST_CANDIDATES):
+        """
+        Up to `k` (user_id, shared_interests) pairs with the best similar-interest score.
+
+        The score is the one recommend_users ranks them by (80% shared
+        interests, 20% follower count capped at 1000), computed over the
+        posting lists of `interest_ids` only. The user and `exclude` are left out.
+        """
+        members = self.members
+        columns = self.categories.lookup([str(i) for i in interest_ids])
+        columns = columns[(columns >= 0) & (columns < members.shape[1])]
+        if not len(columns):
+            return []
+
+        overlap = np.asarray(members[:, columns].sum(axis=1)).ravel()
+        excluded = self.users.lookup([user_id, *exclude])
+        overlap[excluded[(excluded >= 0) & (excluded < len(overlap))]] = 0
+        candidates = np.flatnonzero(overlap)
+
+        scores = overlap[candidates] * 0.8 + np.minimum(self.follower_count[candidates] / 1000, 1.0) * 0.2
+        best = candidates[top_k(scores, k)]
+        return [(self.users.ids[c], int(overlap[c])) for c in best]
+
+
+def adjacency(rows, n_columns):
+    """CSR matrix with a one at (i, j) for every j in rows[i]."""
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=indptr[1:])
+    indices = np.concatenate(rows) if rows else np.empty(0, dtype=np.int32)
+    return sp.csr_matrix(
+        (np.ones(len(indices), dtype=np.int32), indices, indptr), shape=(len(rows), n_columns)
+    )
+
+
+async def ensure_user_indexes(db):
+    try:
+        await db.users.create_indexes(USER_INDEXES)
+    except Exception as e:
+        logging.error(f"Could not create user indexes: {e}")
+
+
+async def refresh_follow_graph(db, graph=None):
+    """
+    Load the follow graph, or bring `graph` up to date with users changed since its last refresh.
+
+    updatedAt is compared inclusively so writes sharing the last stamp are not
+    missed; re-applying an unchanged row is skipped. Rows are applied in a
+    worker thread so a large rebuild does not block the event loop.
+    """
+    if graph is None:
+        graph = FollowGraph()
+    query = {"updatedAt": {"$gte": graph.updated_at}} if graph.updated_at else {}
+    docs = await db.users.find(query, {"following": 1, "interests": 1, "followerCount": 1, "updatedAt": 1}).to_list(None)
+    await asyncio.to_thread(graph.apply, docs)
+    return graph
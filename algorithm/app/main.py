@@ -1,147 +1,571 @@
-from fastapi import FastAPI
-from pymongo import MongoClient
+import time
+
+# Start of the import-to-ready measurement exposed on /health and /metrics
+IMPORT_STARTED = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel
 from bson import ObjectId
-from app.model import RecommendationModel
-from app.utils import oid_str, get_user_seen_posts, get_time_filtered_query
+from app import artifacts
+from app.database import connect_async, connect_sync
+from app.extract import get_interactions_since, save_marks
+from app.candidates import (
+    CANDIDATE_POOL_REFRESH, PostColumns, ensure_indexes, explore_candidates, fetch_candidates,
+    load_candidate_pool, load_candidate_pool_sync, timeline_candidates
+)
+from app.follow_graph import (
+    FOLLOW_GRAPH_REFRESH, FollowGraph, ensure_user_indexes, refresh_follow_graph
+)
+from app.feeds import (
+    FEED_MATERIALIZED, FEED_REFRESH_INTERVAL, fresh_posts, load_feed, refresh_feeds, stored_explore
+)
+from app.metrics import (
+    REQUEST_SECONDS, REQUESTS, STAGE_SECONDS, StackSampler, gauges, render, should_profile, stage, timed,
+    write_profile
+)
+from app.scoring import fallback_scores, model_scores, rank_explore, rank_timeline, timeline_scores, top_k
+from app.response_cache import ResponseCache
+from app.seen_cache import SeenPostsCache
+from app.training import TrainingJobs
+from app.trending import EVENT_WEIGHTS, TRENDING_FROM_POOL, Trending
+from app.utils import oid_str, post_summary
 import os
 import logging
 import numpy as np
-from datetime import datetime, timedelta
-import os
+from datetime import datetime
+from typing import List, Literal, Optional, Union
+import asyncio
+import orjson
+import threading
+
+# Request handlers await the async client; training runs blocking reads in a worker thread.
+# Both are created by the lifespan hook (see connect()), not at import time.
+client = db = None
+training_client = training_db = None
+
+# Users scored together in one matrix by the batch timeline endpoint
+TIMELINE_BATCH_CHUNK = int(os.getenv("TIMELINE_BATCH_CHUNK", "256"))
+
+# Seconds /health waits for the MongoDB ping
+HEALTH_PING_TIMEOUT = float(os.getenv("HEALTH_PING_TIMEOUT", "2"))
+
+# Seconds startup waits for the first MongoDB ping and for warm-up loads
+STARTUP_PING_TIMEOUT = float(os.getenv("STARTUP_PING_TIMEOUT", "10"))
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "60"))
+
+# Seconds between checks for a newly promoted model version (0 disables)
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))
+
+model = artifacts.new_model()
+training_jobs = TrainingJobs()
+background_tasks = set()
+seen_cache = SeenPostsCache()
+response_cache = ResponseCache()
+trending = Trending()
+# Shared snapshot of recent public posts; None until the first load succeeds
+candidate_pool = None
+# Follow graph for friend-of-friend suggestions; None until the first load succeeds
+follow_graph = None
+# One follow graph load or refresh at a time
+follow_graph_lock = asyncio.Lock()
+# One incremental update at a time: partial_train mutates the served model in place
+incremental_lock = threading.Lock()
+
+
+def response_key(endpoint, user_id, limit):
+    """Cache key of a feed response; a new model version or pool snapshot changes it."""
+    epoch = candidate_pool.epoch if candidate_pool is not None else 0
+    return (endpoint, user_id, limit, model.version, epoch)
+
+
+def swap_model(new_model):
+    """Replace the served model in one reference assignment."""
+    global model
+    model = new_model
+
+
+async def watch_current_model():
+    """Hot-swap in whatever version another worker or an offline job promoted."""
+    while True:
+        await asyncio.sleep(MODEL_RELOAD_INTERVAL)
+        try:
+            version = artifacts.current_version()
+            if version and version != model.version:
+                new_model = await asyncio.to_thread(artifacts.load_version, version)
+                if new_model:
+                    swap_model(new_model)
+                    logging.info(f"Loaded model version {version}")
+        except Exception as e:
+            logging.error(f"Model reload failed: {e}")
+
+
+async def finish_training():
+    """Wait for this worker's training process and swap in the version it published."""
+    record = await asyncio.to_thread(training_jobs.wait)
+    for name, seconds in (record.get("timings") or {}).items():
+        STAGE_SECONDS.observe(seconds, "train", name)
+
+    if record["status"] != "trained":
+        logging.error(f"Training job {record['job_id']} ended with {record['status']}: {record.get('message')}")
+        return
+    new_model = await asyncio.to_thread(artifacts.load_version, record["version"])
+    if new_model:
+        swap_model(new_model)
+        logging.info(f"Training job {record['job_id']} finished, serving model version {new_model.version}")
+
+
+async def reload_candidate_pool():
+    global candidate_pool
+    try:
+        epoch = candidate_pool.epoch + 1 if candidate_pool is not None else 1
+        # Reading and building the arrays takes ~1s at 200k posts, so it runs in a worker thread
+        pool = await asyncio.to_thread(load_candidate_pool_sync, training_db, epoch)
+        current_model = model
+        if current_model.trained and hasattr(current_model, "retrieve"):
+            # Narrow the ANN index to the pool before requests need it
+            await asyncio.to_thread(pool.ann_index, current_model)
+        previous, candidate_pool = candidate_pool, pool
+        if TRENDING_FROM_POOL and previous is not None:
+            await asyncio.to_thread(trending.observe_pool, previous, pool)
+    except Exception as e:
+        logging.error(f"Candidate pool refresh failed: {e}")
+
+
+async def refresh_candidate_pool():
+    """Reload the shared candidate pool every CANDIDATE_POOL_REFRESH seconds (warm-up did the first load)."""
+    while True:
+        await asyncio.sleep(CANDIDATE_POOL_REFRESH)
+        await reload_candidate_pool()
+
+
+async def reload_follow_graph():
+    global follow_graph
+    async with follow_graph_lock:
+        try:
+            follow_graph = await refresh_follow_graph(db, follow_graph)
+        except Exception as e:
+            logging.error(f"Follow graph refresh failed: {e}")
+
+
+async def current_follow_graph():
+    """The loaded follow graph, loading it first if no load has succeeded yet (empty if that fails)."""
+    if follow_graph is None:
+        if follow_graph_lock.locked():
+            # The warm-up or another request is loading it; wait for that load instead of repeating it
+            async with follow_graph_lock:
+                pass
+        else:
+            await reload_follow_graph()
+    return follow_graph if follow_graph is not None else FollowGraph()
+
+
+async def watch_follow_graph():
+    """Apply users changed since the last refresh every FOLLOW_GRAPH_REFRESH seconds."""
+    while True:
+        await asyncio.sleep(FOLLOW_GRAPH_REFRESH)
+        await reload_follow_graph()
+
+
+async def refresh_feeds_periodically():
+    """Re-materialize stored feeds every FEED_REFRESH_INTERVAL seconds (worker processes do the ranking)."""
+    while True:
+        await asyncio.sleep(FEED_REFRESH_INTERVAL)
+        try:
+            await asyncio.to_thread(refresh_feeds)
+        except Exception as e:
+            logging.error(f"Feed refresh failed: {e}")
+
+
+def connect():
+    """Create the Mongo clients unless some are already attached (benchmarks attach mongomock)."""
+    global client, db, training_client, training_db
+    if db is None:
+        client, db = connect_async()
+    if training_db is None:
+        training_client, training_db = connect_sync()
+
+
+# Seconds from the start of importing this module to each startup milestone
+startup = {}
+
+
+async def warm_up(database_connected):
+    """Load persisted and precomputed state, so the first requests are served from memory."""
+    try:
+        loaded = await asyncio.to_thread(artifacts.load_version)
+        if loaded:
+            swap_model(loaded)
+            logging.info(f"Loaded model version {loaded.version}")
+    except Exception as e:
+        logging.error(f"Could not load persisted model: {e}")
+
+    if not database_connected:
+        return
+    loads = []
+    if CANDIDATE_POOL_REFRESH > 0:
+        loads.append(reload_candidate_pool())
+    if FOLLOW_GRAPH_REFRESH > 0:
+        loads.append(reload_follow_graph())
+    try:
+        # Shielded: a load that outlasts the timeout keeps running in the background
+        await asyncio.wait_for(asyncio.shield(asyncio.gather(*loads)), timeout=WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logging.warning(f"Warm-up did not finish in {WARMUP_TIMEOUT}s; serving while it completes")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    startup["import_seconds"] = round(IMPORT_FINISHED - IMPORT_STARTED, 4)
+    lifespan_started = time.perf_counter()
+
+    connect()
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout=STARTUP_PING_TIMEOUT)
+        database_connected = True
+    except Exception as e:
+        logging.error(f"MongoDB is not reachable at startup: {e}")
+        database_connected = False
+    startup["connect_seconds"] = round(time.perf_counter() - lifespan_started, 4)
+
+    if database_connected:
+        await ensure_indexes(db)
+        await ensure_user_indexes(db)
+
+    warmup_started = time.perf_counter()
+    await warm_up(database_connected)
+    startup["warmup_seconds"] = round(time.perf_counter() - warmup_started, 4)
+    startup["ready_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 4)
+    logging.info(f"Ready {startup['ready_seconds']}s after import started")
+
+    tasks = []
+    if MODEL_RELOAD_INTERVAL > 0:
+        tasks.append(asyncio.create_task(watch_current_model()))
+    if CANDIDATE_POOL_REFRESH > 0:
+        tasks.append(asyncio.create_task(refresh_candidate_pool()))
+    if FOLLOW_GRAPH_REFRESH > 0:
+        tasks.append(asyncio.create_task(watch_follow_graph()))
+    if FEED_REFRESH_INTERVAL > 0:
+        tasks.append(asyncio.create_task(refresh_feeds_periodically()))
+    yield
+    for task in tasks:
+        task.cancel()
+    if client is not None:
+        await client.close()
+    if training_client is not None:
+        training_client.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count and time every request by route template; profile a sampled fraction of them."""
+    sampler = StackSampler(threading.get_ident()).start() if should_profile() else None
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, route, status)
+        REQUESTS.inc(request.method, route, status)
+        if sampler is not None:
+            write_profile(route, sampler.stop())
+
+
+def serialize(endpoint, response_model, payload):
+    """Validate and encode a response as the serialization stage of `endpoint`."""
+    with stage(endpoint, "serialization"):
+        body = response_model.model_validate(payload).model_dump_json()
+    return Response(body, media_type="application/json")
+
+
+# Fields of the requesting user the feed and suggestion endpoints read
+FEED_USER_PROJECTION = {"following": 1, "interests": 1}
+
+# Fields of a suggested user; leaves out following/followers arrays and credentials
+USER_PROJECTION = {
+    "username": 1,
+    "fullName": 1,
+    "bio": 1,
+    "followerCount": 1,
+    "followingCount": 1,
+    "isVerified": 1,
+    "profilePicture": 1,
+    "interests": 1,
+}
+
+
+class InteractionEvent(BaseModel):
+    user_id: str
+    post_id: str
+    event: Literal["like", "unlike", "seen"]
+
+
+class IncrementalTrainRequest(BaseModel):
+    events: List[InteractionEvent] = []
+
+
+class SeenPostsUpdate(BaseModel):
+    post_ids: List[str] = []
+    reset: bool = False
+
+
+class BatchTimelineRequest(BaseModel):
+    user_ids: List[str]
+    limit: int = 20
+
 
-MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
-MONGO_INITDB_DATABASE = os.getenv("MONGO_INITDB_DATABASE", "your_database_name")
-client = MongoClient(MONGODB_URI)
-db = client[MONGO_INITDB_DATABASE]
+class ModelSwapRequest(BaseModel):
+    version: Optional[str] = None
 
-app = FastAPI()
-model = RecommendationModel()
 
-@app.post("/train")
-def train_model():
+class EngagementEvent(BaseModel):
+    post_id: str
+    event: Literal["like", "comment", "share"]
+    # Looked up in the candidate pool when omitted
+    hashtags: Optional[List[str]] = None
+    timestamp: Optional[datetime] = None
+
+
+class EngagementEvents(BaseModel):
+    events: List[EngagementEvent]
+
+
+# Response models: FastAPI validates handler results against them and
+# serializes straight to JSON bytes with pydantic instead of jsonable_encoder
+
+class ErrorResponse(BaseModel):
+    error: str
+
+
+class Media(BaseModel):
+    type: str
+    url: str
+    thumbnail: Optional[str] = None
+
+
+class PostSummary(BaseModel):
+    post_id: str
+    text: str
+    author: str
+    category: Optional[str] = None
+    likeCount: int = 0
+    commentCount: int = 0
+    shareCount: int = 0
+    createdAt: datetime
+    hashtags: List[str] = []
+    media: List[Media] = []
+
+
+class Prediction(BaseModel):
+    post_id: str
+    text: str
+    author: str
+    category: Optional[str] = None
+    likeCount: int = 0
+    commentCount: int = 0
+    shareCount: int = 0
+    hashtags: List[str] = []
+    createdAt: datetime
+    score: float
+
+
+class PredictResponse(BaseModel):
+    predictions: List[Prediction]
+
+
+class TimelineResponse(BaseModel):
+    timeline: List[PostSummary]
+
+
+class ExploreResponse(BaseModel):
+    explore: List[PostSummary]
+
+
+class SuggestedUser(BaseModel):
+    user_id: str
+    username: str
+    fullName: str
+    bio: Optional[str] = ""
+    followerCount: int = 0
+    followingCount: int = 0
+    isVerified: bool = False
+    profilePicture: Optional[str] = None
+    score: float
+    shared_interests: int
+    mutual_follows: int = 0
+    recommendation_reason: Literal["similar_interests", "followed_by_friends", "popular_in_interests"]
+
+
+class SuggestedUsersResponse(BaseModel):
+    suggested_users: List[SuggestedUser]
+
+
+class TrendingPost(BaseModel):
+    post_id: str
+    score: float
+    velocity: float
+    # Present when the post is in this worker's candidate pool
+    post: Optional[PostSummary] = None
+
+
+class TrendingPostsResponse(BaseModel):
+    posts: List[TrendingPost]
+
+
+class TrendingHashtag(BaseModel):
+    hashtag: str
+    score: float
+    velocity: float
+
+
+class TrendingHashtagsResponse(BaseModel):
+    hashtags: List[TrendingHashtag]
+
+
+@app.post("/train", status_code=202)
+async def train_model():
     """
-    Train the recommendation model using historical interaction data.
-    Collects positive interactions (likes) and creates negative samples.
+    Start training the recommendation model on historical interaction data.
+
+    Training runs in its own process, so this returns a job id right away;
+    poll GET /train/{job_id} for progress. Requests keep being served by the
+    current model until the new version is published and swapped in.
     """
-    interactions = []
-    
-    # Collect positive interactions from likes
-    for post in db.posts.find({"likeCount": {"$gt": 0}}, limit=1000):
-        for uid in post.get("likes", []):
-            interactions.append({
-                "user_id": oid_str(uid),
-                "post_id": oid_str(post["_id"]),
-                "label": 1
-            })
-    
-    # Create negative samples (users who didn't like posts they could have seen)
-    # This is important for training the model to distinguish between liked and not-liked content
-    users = list(db.users.find({}, {"_id": 1}).limit(100))
-    posts = list(db.posts.find({"visibility": "public"}, {"_id": 1, "likes": 1}).limit(500))
-    
-    negative_count = 0
-    max_negatives = len(interactions) // 2  # Balance positive and negative samples
-    
-    for user in users:
-        user_id = oid_str(user["_id"])
-        for post in posts:
-            post_id = oid_str(post["_id"])
-            # If user didn't like this post, it's a negative sample
-            if user["_id"] not in post.get("likes", []):
-                interactions.append({
-                    "user_id": user_id,
-                    "post_id": post_id,
-                    "label": 0
-                })
-                negative_count += 1
-                if negative_count >= max_negatives:
-                    break
-        if negative_count >= max_negatives:
-            break
-
-    if interactions:
-        model.train(interactions)
-        return {
-            "status": "trained",
-            "total_samples": len(interactions),
-            "positive_samples": len([i for i in interactions if i["label"] == 1]),
-            "negative_samples": len([i for i in interactions if i["label"] == 0])
-        }
+    # One job at a time across workers: a job in flight anywhere is returned instead
+    job, started = await asyncio.to_thread(training_jobs.start)
+    if started:
+        # Keep a reference so the task is not garbage collected mid-flight
+        background_tasks.add(task := asyncio.create_task(finish_training()))
+        task.add_done_callback(background_tasks.discard)
+    return job
+
+
+@app.get("/train/{job_id}")
+def training_status(job_id: str):
+    """Status, stage and progress of a training job; sample counts and version once known."""
+    job = training_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown training job")
+    return job
+
+@app.post("/train/incremental")
+def train_incremental(request: Optional[IncrementalTrainRequest] = None):
+    """
+    Update the trained model with interactions newer than the last checkpoint.
+
+    Events can be posted explicitly (like -> positive, unlike/seen -> negative);
+    otherwise they are derived from posts and histories updated since the
+    last training run.
+    """
+    with incremental_lock:
+        return apply_incremental(request)
+
+
+def apply_incremental(request):
+    """Body of /train/incremental; the caller holds incremental_lock."""
+    # The model being updated, even if a full training run swaps in another meanwhile
+    current_model = model
+    base_version = current_model.version
+    checkpoint = datetime.now()
+
+    marks = []
+    if request and request.events:
+        interactions = [{
+            "user_id": e.user_id,
+            "post_id": e.post_id,
+            "label": 1 if e.event == "like" else 0
+        } for e in request.events]
+    elif current_model.checkpoint is None:
+        return {"status": "no_checkpoint", "message": "Run /train before incremental updates"}
     else:
-        return {"status": "no_data", "message": "No interaction data found for training"}
+        with stage("train_incremental", "extract"):
+            interactions, marks = get_interactions_since(training_db, current_model.checkpoint)
+
+    if not interactions:
+        save_marks(training_db, marks)
+        return {"status": "no_data", "message": "No new interactions since last checkpoint"}
+
+    with stage("train_incremental", "fit"):
+        updated = current_model.partial_train(interactions)
+    if not updated:
+        return {"status": "failed", "message": "Incremental training failed"}
+
+    # A full training run published or swapped in a newer model meanwhile: publishing
+    # this one would replace it as CURRENT, so drop the update instead
+    published = artifacts.current_version()
+    if model is not current_model or (published is not None and published != base_version):
+        logging.warning("Model changed during the incremental update; not publishing it")
+        return {"status": "superseded", "message": "A newer model was published during the update; retry against it"}
 
-@app.get("/predict/{user_id}")
-def predict_likes(user_id: str, limit: int = 10):
-    # Get user to check their interests for better recommendations
-    user = db.users.find_one({"_id": ObjectId(user_id)})
+    # Explicit events are not tied to the Mongo state, so only advance on derived updates
+    if not (request and request.events):
+        current_model.checkpoint = checkpoint
+        save_marks(training_db, marks)
+
+    try:
+        artifacts.publish(current_model)
+    except OSError as e:
+        logging.error(f"Could not persist model: {e}")
+
+    return {
+        "status": "updated",
+        "total_samples": len(interactions),
+        "positive_samples": len([i for i in interactions if i["label"] == 1]),
+        "negative_samples": len([i for i in interactions if i["label"] == 0]),
+        "checkpoint": current_model.checkpoint
+    }
+
+@app.get("/predict/{user_id}", response_model=Union[PredictResponse, ErrorResponse])
+async def predict_likes(user_id: str, limit: int = 10):
+    endpoint = "predict"
+    # Get user to check their interests for better recommendations, and the
+    # user's seen posts to filter them out in-process, in parallel
+    user, seen = await asyncio.gather(
+        timed(endpoint, "user_lookup", db.users.find_one({"_id": ObjectId(user_id)}, FEED_USER_PROJECTION)),
+        timed(endpoint, "seen_history", seen_cache.get(db, user_id))
+    )
     if not user:
         return {"error": "User not found"}
     
-    # Get user's seen posts to filter them out
-    seen_post_ids = get_user_seen_posts(db, user_id)
-    seen_object_ids = [ObjectId(pid) for pid in seen_post_ids if ObjectId.is_valid(pid)]
-    
-    # Build query to exclude seen posts and apply time filtering
-    # First try posts from past 3 days
-    three_days_query = get_time_filtered_query(3)
+    # Candidates from the past 3 days, topped up from the past 5 days if short;
+    # served from the shared pool when loaded, otherwise one Mongo query
     base_query = {
         "visibility": "public",
-        "author": {"$ne": ObjectId(user_id)},
-        "_id": {"$nin": seen_object_ids}  # Exclude seen posts
+        "author": {"$ne": ObjectId(user_id)}
     }
+    pool = candidate_pool
+    if pool is not None:
+        with stage(endpoint, "candidates_pool"):
+            candidates = explore_candidates(pool, user, seen, limit, model, sort=("createdAt", -1))
+    else:
+        with stage(endpoint, "candidates_query"):
+            candidates = PostColumns(await fetch_candidates(db, base_query, seen, limit * 3, limit))
     
-    # Combine base query with time filter
-    query_3_days = {**base_query, **three_days_query}
-    
-    # Get candidate posts from past 3 days first
-    posts = list(db.posts.find(query_3_days).limit(limit * 3))
-    
-    # If not enough posts, try past 5 days
-    if len(posts) < limit:
-        five_days_query = get_time_filtered_query(5)
-        query_5_days = {**base_query, **five_days_query}
-        
-        # Get additional posts, excluding what we already have
-        existing_post_ids = [p["_id"] for p in posts]
-        query_5_days["_id"]["$nin"].extend(existing_post_ids)
-        
-        additional_posts = list(db.posts.find(query_5_days).limit(limit * 3))
-        posts.extend(additional_posts)
-    
-    if not posts:
-        return {"predictions": []}
-    
-    post_ids = [oid_str(p["_id"]) for p in posts]
+    if not len(candidates):
+        return serialize(endpoint, PredictResponse, {"predictions": []})
 
-    # Use ML model if trained
-    if model.trained:
-        scores = model.predict(user_id, post_ids)
-        ranked = sorted(zip(posts, scores), key=lambda x: x[1], reverse=True)
-    else:
-        # Fallback: simple scoring based on engagement and user interests
-        user_interests = set(str(i) for i in user.get("interests", []))
-        scored_posts = []
-        
-        for post in posts:
-            score = 0.0
-            # Interest match bonus
-            if post.get("category") and str(post["category"]) in user_interests:
-                score += 0.5
-            
-            # Engagement score
-            engagement = (
-                post.get("likeCount", 0) * 0.5 +
-                post.get("commentCount", 0) * 0.3 +
-                post.get("shareCount", 0) * 0.2
+    with stage(endpoint, "scoring"):
+        # Use ML model if trained
+        if model.trained:
+            scores = np.asarray(
+                model.predict(user_id, candidates.post_ids, candidates.cold_start), dtype=np.float64
             )
-            score += min(engagement / 100, 0.5)  # Normalize engagement
-            
-            scored_posts.append((post, score))
-        
-        ranked = sorted(scored_posts, key=lambda x: x[1], reverse=True)
+        else:
+            # Fallback: simple scoring based on engagement and user interests
+            scores = fallback_scores(candidates, user.get("interests", []))
+
+    with stage(endpoint, "ranking"):
+        ranked = [(candidates.docs[i], scores[i]) for i in top_k(scores, limit)]
 
     # Return top predictions
-    return {
+    return serialize(endpoint, PredictResponse, {
         "predictions": [{
             "post_id": oid_str(p["_id"]),
             "text": p["text"],
@@ -153,190 +577,220 @@ def predict_likes(user_id: str, limit: int = 10):
             "hashtags": p.get("hashtags", []),
             "createdAt": p["createdAt"],
             "score": float(score)
-        } for p, score in ranked[:limit]]
-    }
+        } for p, score in ranked]
+    })
+
+async def feed_reads(endpoint, kind, user_id):
+    """
+    (stored feed, seen set, user lookup task) for a feed request, read in parallel.
+
+    The stored feed is None unless feeds are materialized. The user document
+    is only needed for live ranking, so its lookup is returned as a running
+    task: await it on a miss, cancel it when the stored feed is served.
+    """
+    user_lookup = asyncio.ensure_future(
+        timed(endpoint, "user_lookup", db.users.find_one({"_id": ObjectId(user_id)}, FEED_USER_PROJECTION))
+    )
+    try:
+        if not FEED_MATERIALIZED:
+            return None, await timed(endpoint, "seen_history", seen_cache.get(db, user_id)), user_lookup
+        stored, seen = await asyncio.gather(
+            timed(endpoint, "stored_feed", load_feed(db, kind, user_id)),
+            timed(endpoint, "seen_history", seen_cache.get(db, user_id))
+        )
+        return stored, seen, user_lookup
+    except BaseException:
+        user_lookup.cancel()
+        raise
+
+
+@app.get("/recommend/timeline/{user_id}", response_model=Union[TimelineResponse, ErrorResponse])
+async def recommend_timeline(user_id: str, limit: int = 20):
+    endpoint = "timeline"
+    key = response_key(endpoint, user_id, limit)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return serialize(endpoint, TimelineResponse, cached)
 
-@app.get("/recommend/timeline/{user_id}")
-def recommend_timeline(user_id: str, limit: int = 20):
-    user = db.users.find_one({"_id": ObjectId(user_id)})
+    # Serve the materialized feed when it is fresh; otherwise rank live
+    stored, seen, user_lookup = await feed_reads(endpoint, "timeline", user_id)
+    posts = fresh_posts(stored, seen, limit, model.version)
+    if posts is not None:
+        user_lookup.cancel()
+        response = {"timeline": posts}
+        response_cache.put(key, response)
+        return serialize(endpoint, TimelineResponse, response)
+
+    user = await user_lookup
     if not user:
         return {"error": "User not found"}
 
     following = user.get("following", [])
     category_ids = user.get("interests", [])
     
-    # Get user's seen posts to filter them out
-    seen_post_ids = get_user_seen_posts(db, user_id)
-    seen_object_ids = [ObjectId(pid) for pid in seen_post_ids if ObjectId.is_valid(pid)]
-    
-    # Build query to exclude seen posts and apply time filtering
-    # First try posts from past 3 days
-    three_days_query = get_time_filtered_query(3)
+    # Candidates from the past 3 days, topped up from the past 5 days if short;
+    # served from the shared pool when loaded, otherwise one Mongo query
     base_query = {
         "$or": [
             {"author": {"$in": following}},
             {"category": {"$in": category_ids}}
         ],
-        "visibility": "public",
-        "_id": {"$nin": seen_object_ids}  # Exclude seen posts
+        "visibility": "public"
     }
-    
-    # Combine with time filter for 3 days
-    query_3_days = {**base_query, **three_days_query}
-    posts = list(db.posts.find(query_3_days).sort("createdAt", -1).limit(limit * 2))
-    
-    # If not enough posts, try past 5 days
-    if len(posts) < limit:
-        five_days_query = get_time_filtered_query(5)
-        query_5_days = {**base_query, **five_days_query}
-        
-        # Get additional posts, excluding what we already have
-        existing_post_ids = [p["_id"] for p in posts]
-        query_5_days["_id"]["$nin"].extend(existing_post_ids)
-        
-        additional_posts = list(db.posts.find(query_5_days).sort("createdAt", -1).limit(limit * 2))
-        posts.extend(additional_posts)
-    
-    # If we have a trained model, use ML recommendations
-    if model.trained and posts:
-        post_ids = [oid_str(p["_id"]) for p in posts]
-        scores = model.predict(user_id, post_ids)
-        
-        # Combine ML scores with recency and engagement
-        enhanced_posts = []
-        for post, ml_score in zip(posts, scores):
-            # Calculate engagement score
-            engagement_score = (
-                post.get("likeCount", 0) * 0.5 +
-                post.get("commentCount", 0) * 0.3 +
-                post.get("shareCount", 0) * 0.2
-            ) / max(1, post.get("likeCount", 0) + post.get("commentCount", 0) + post.get("shareCount", 0))
-            
-            # Combine scores: 60% ML, 30% engagement, 10% recency boost for recent posts
-            from datetime import datetime, timedelta
-            recency_boost = 0.1 if post.get("createdAt") and \
-                (datetime.now() - post["createdAt"]).days < 1 else 0
-            
-            final_score = ml_score * 0.6 + engagement_score * 0.3 + recency_boost
-            enhanced_posts.append((post, final_score))
-        
-        # Sort by final score
-        enhanced_posts.sort(key=lambda x: x[1], reverse=True)
-        posts = [p[0] for p in enhanced_posts[:limit]]
+    pool = candidate_pool
+    if pool is not None:
+        with stage(endpoint, "candidates_pool"):
+            candidates = timeline_candidates(pool, user, seen, limit)
     else:
-        # Fallback to basic recommendation
-        posts = posts[:limit]
-
-    result = [{
-        "post_id": oid_str(p["_id"]),
-        "text": p["text"],
-        "author": oid_str(p["author"]),
-        "category": oid_str(p["category"]) if p.get("category") else None,
-        "likeCount": p.get("likeCount", 0),
-        "commentCount": p.get("commentCount", 0),
-        "shareCount": p.get("shareCount", 0),
-        "createdAt": p["createdAt"],
-        "hashtags": p.get("hashtags", []),
-        "media": p.get("media", [])
-    } for p in posts]
-
-    return {"timeline": result}
-
-@app.get("/recommend/explore/{user_id}")
-def recommend_explore(user_id: str, limit: int = 30):
+        with stage(endpoint, "candidates_query"):
+            candidates = PostColumns(
+                await fetch_candidates(db, base_query, seen, limit * 2, limit, sort=("createdAt", -1))
+            )
+    
+    with stage(endpoint, "scoring"):
+        scores = model_scores(model, user_id, candidates)
+
+    # ML blend when trained, newest-first otherwise
+    with stage(endpoint, "ranking"):
+        posts = rank_timeline(candidates, scores, limit, datetime.now().timestamp())
+
+    response = {"timeline": [post_summary(p) for p in posts]}
+    response_cache.put(key, response)
+    return serialize(endpoint, TimelineResponse, response)
+
+@app.post("/recommend/timeline/batch")
+async def recommend_timeline_batch(request: BatchTimelineRequest):
+    """
+    Timelines for many users in one call, streamed as NDJSON (one user per line).
+
+    Users and seen histories are fetched with $in, every user is matched
+    against the shared candidate pool, and the model scores each chunk of
+    users as a single users x candidates matrix.
+    """
+    limit = request.limit
+    user_ids = list(dict.fromkeys(request.user_ids))
+    object_ids = [ObjectId(uid) for uid in user_ids if ObjectId.is_valid(uid)]
+
+    users, seen = await asyncio.gather(
+        db.users.find({"_id": {"$in": object_ids}}, {"following": 1, "interests": 1}).to_list(None),
+        seen_cache.get_many(db, [str(oid) for oid in object_ids])
+    )
+    users = {str(u["_id"]): u for u in users}
+    pool = candidate_pool
+    if pool is None:
+        # No shared pool: load only these users' candidates
+        pool = await load_candidate_pool(db, query={"$or": [
+            {"author": {"$in": list({a for u in users.values() for a in u.get("following", [])})}},
+            {"category": {"$in": list({c for u in users.values() for c in u.get("interests", [])})}}
+        ]})
+    current_model = model
+    now = datetime.now().timestamp()
+
+    def timelines(chunk):
+        picks = {}
+        for uid in chunk:
+            if uid in users:
+                mask = pool.mask(
+                    seen=seen.get(uid),
+                    authors=users[uid].get("following", []),
+                    categories=users[uid].get("interests", [])
+                )
+                picks[uid] = pool.take(mask, limit * 2, limit, sort=("createdAt", -1))
+
+        results = {}
+        if current_model.trained and picks:
+            # Score every user of the chunk against the union of their candidates at once
+            columns = np.unique(np.concatenate(list(picks.values())))
+            candidates = pool.subset(columns)
+            ml_scores = current_model.predict_many(list(picks), candidates.post_ids, candidates.cold_start)
+            final_scores = timeline_scores(candidates, ml_scores, now)
+            for row, (uid, picked) in enumerate(picks.items()):
+                positions = np.searchsorted(columns, picked)
+                best = positions[top_k(final_scores[row, positions], limit)]
+                results[uid] = [candidates.docs[i] for i in best]
+        else:
+            for uid, picked in picks.items():
+                results[uid] = [pool.docs[i] for i in picked[:limit]]
+        return results
+
+    def lines():
+        for start in range(0, len(user_ids), TIMELINE_BATCH_CHUNK):
+            chunk = user_ids[start:start + TIMELINE_BATCH_CHUNK]
+            results = timelines(chunk)
+            for uid in chunk:
+                if uid in results:
+                    line = {"user_id": uid, "timeline": [post_summary(p) for p in results[uid]]}
+                else:
+                    line = {"user_id": uid, "error": "User not found"}
+                yield orjson.dumps(line) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/recommend/explore/{user_id}", response_model=Union[ExploreResponse, ErrorResponse])
+async def recommend_explore(user_id: str, limit: int = 30):
     """
     Recommend posts for explore page - diverse content excluding seen posts
     """
-    user = db.users.find_one({"_id": ObjectId(user_id)})
+    endpoint = "explore"
+    key = response_key(endpoint, user_id, limit)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return serialize(endpoint, ExploreResponse, cached)
+
+    # Serve the materialized feed when it is fresh; otherwise rank live
+    stored, seen, user_lookup = await feed_reads(endpoint, "explore", user_id)
+    stored_candidates = stored_explore(stored, seen, limit, model.version)
+    if stored_candidates is not None:
+        candidates, scores = stored_candidates
+        with stage(endpoint, "ranking"):
+            posts = rank_explore(candidates, scores, limit, trending.velocity(candidates.post_ids))
+        user_lookup.cancel()
+        response = {"explore": posts}
+        response_cache.put(key, response)
+        return serialize(endpoint, ExploreResponse, response)
+
+    user = await user_lookup
     if not user:
         return {"error": "User not found"}
-
-    # Get user's seen posts to filter them out
-    seen_post_ids = get_user_seen_posts(db, user_id)
-    seen_object_ids = [ObjectId(pid) for pid in seen_post_ids if ObjectId.is_valid(pid)]
     
-    # Build query to exclude seen posts and user's own posts
-    # First try posts from past 3 days
-    three_days_query = get_time_filtered_query(3)
+    # Candidates from the past 3 days, topped up from the past 5 days if short;
+    # served from the shared pool when loaded, otherwise one Mongo query
     base_query = {
         "visibility": "public",
-        "author": {"$ne": ObjectId(user_id)},  # Exclude user's own posts
-        "_id": {"$nin": seen_object_ids}  # Exclude seen posts
+        "author": {"$ne": ObjectId(user_id)}  # Exclude user's own posts
     }
-    
-    # Combine with time filter for 3 days
-    query_3_days = {**base_query, **three_days_query}
-    posts = list(db.posts.find(query_3_days).sort("likeCount", -1).limit(limit * 3))
-    
-    # If not enough posts, try past 5 days
-    if len(posts) < limit:
-        five_days_query = get_time_filtered_query(5)
-        query_5_days = {**base_query, **five_days_query}
-        
-        # Get additional posts, excluding what we already have
-        existing_post_ids = [p["_id"] for p in posts]
-        query_5_days["_id"]["$nin"].extend(existing_post_ids)
-        
-        additional_posts = list(db.posts.find(query_5_days).sort("likeCount", -1).limit(limit * 3))
-        posts.extend(additional_posts)
-    
-    # If we have a trained model, use ML recommendations for diverse content
-    if model.trained and posts:
-        post_ids = [oid_str(p["_id"]) for p in posts]
-        scores = model.predict(user_id, post_ids)
-        
-        # For explore, we want diverse content, so we'll mix high-scoring and randomly selected posts
-        scored_posts = list(zip(posts, scores))
-        scored_posts.sort(key=lambda x: x[1], reverse=True)
-        
-        # Take top 70% by ML score and 30% with high engagement but diverse content
-        top_ml = scored_posts[:int(limit * 0.7)]
-        remaining_posts = scored_posts[int(limit * 0.7):]
-        
-        # From remaining, select posts with good engagement for diversity
-        engagement_sorted = sorted(remaining_posts, key=lambda x: (
-            x[0].get("likeCount", 0) + 
-            x[0].get("commentCount", 0) * 2 + 
-            x[0].get("shareCount", 0) * 3
-        ), reverse=True)
-        
-        diverse_posts = engagement_sorted[:int(limit * 0.3)]
-        
-        final_posts = [p[0] for p in top_ml] + [p[0] for p in diverse_posts]
-        posts = final_posts[:limit]
+    pool = candidate_pool
+    if pool is not None:
+        with stage(endpoint, "candidates_pool"):
+            rising = [post_id for post_id, _, _ in trending.top_posts(limit)]
+            candidates = explore_candidates(pool, user, seen, limit, model, trending=rising)
     else:
-        # Fallback: sort by engagement and recency
-        posts.sort(key=lambda x: (
-            x.get("likeCount", 0) + 
-            x.get("commentCount", 0) * 2 + 
-            x.get("shareCount", 0) * 3
-        ), reverse=True)
-        posts = posts[:limit]
-
-    result = [{
-        "post_id": oid_str(p["_id"]),
-        "text": p["text"],
-        "author": oid_str(p["author"]),
-        "category": oid_str(p["category"]) if p.get("category") else None,
-        "likeCount": p.get("likeCount", 0),
-        "commentCount": p.get("commentCount", 0),
-        "shareCount": p.get("shareCount", 0),
-        "createdAt": p["createdAt"],
-        "hashtags": p.get("hashtags", []),
-        "media": p.get("media", [])
-    } for p in posts]
-
-    return {"explore": result}
-
-@app.get("/recommend/users/{user_id}")
-def recommend_users(user_id: str, limit: int = 10):
+        with stage(endpoint, "candidates_query"):
+            candidates = PostColumns(
+                await fetch_candidates(db, base_query, seen, limit * 3, limit, sort=("likeCount", -1))
+            )
+    
+    with stage(endpoint, "scoring"):
+        scores = model_scores(model, user_id, candidates)
+
+    # 70% ML / 30% trending velocity (engagement if nothing is trending) when trained
+    with stage(endpoint, "ranking"):
+        velocity = trending.velocity(candidates.post_ids)
+        posts = rank_explore(candidates, scores, limit, velocity)
+
+    response = {"explore": [post_summary(p) for p in posts]}
+    response_cache.put(key, response)
+    return serialize(endpoint, ExploreResponse, response)
+
+@app.get("/recommend/users/{user_id}", response_model=Union[SuggestedUsersResponse, ErrorResponse])
+async def recommend_users(user_id: str, limit: int = 10):
     """
     Recommend users to follow based on:
     1. Similar interests (higher priority)
     2. People followed by users they follow
     3. Popular users in their interest categories
     """
-    user = db.users.find_one({"_id": ObjectId(user_id)})
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, FEED_USER_PROJECTION)
     if not user:
         return {"error": "User not found"}
 
@@ -346,25 +800,68 @@ def recommend_users(user_id: str, limit: int = 10):
     user_interests = set(str(i) for i in interest_ids)
 
     recommended = []
+    recommended_ids = set()
     
-    # 1. HIGHEST PRIORITY: Users with similar interests
-    interest_candidates = list(db.users.find({
-        "_id": {"$ne": ObjectId(user_id)},
-        "interests": {"$in": interest_ids}
-    }))
+    # 1. HIGHEST PRIORITY: Users with similar interests, pre-ranked on the
+    # in-memory category index so only the best `limit` documents are read
+    graph = await current_follow_graph()
+    shared_interests = dict(graph.similar_interests(user_id_str, interest_ids, exclude=following, k=limit))
+    interest_candidates = await db.users.find(
+        {"_id": {"$in": [ObjectId(cid) for cid in shared_interests]}}, USER_PROJECTION
+    ).to_list(None) if shared_interests else []
 
     for candidate in interest_candidates:
         cid = str(candidate["_id"])
-        if cid not in following:
-            candidate_interests = set(str(i) for i in candidate.get("interests", []))
-            interest_overlap = len(candidate_interests.intersection(user_interests))
+        interest_overlap = shared_interests[cid]
+        
+        # Higher weight for interest overlap
+        follower_score = min(candidate.get("followerCount", 0) / 1000, 1.0)
+        # Interest overlap gets 80% weight, follower count gets 20%
+        final_score = interest_overlap * 0.8 + follower_score * 0.2
+        
+        recommended_ids.add(cid)
+        recommended.append({
+            "user_id": cid,
+            "username": candidate["username"],
+            "fullName": candidate["fullName"],
+            "bio": candidate.get("bio", ""),
+            "followerCount": candidate.get("followerCount", 0),
+            "followingCount": candidate.get("followingCount", 0),
+            "isVerified": candidate.get("isVerified", False),
+            "profilePicture": candidate.get("profilePicture"),
+            "score": final_score,
+            "shared_interests": interest_overlap,
+            "recommendation_reason": "similar_interests"
+        })
+
+    # 2. MEDIUM PRIORITY: People followed by users you follow (friend-of-friend),
+    # ranked by mutual follows from the in-memory follow graph
+    if len(recommended) < limit:
+        mutual_follows = {
+            cid: count for cid, count in graph.friends_of_friends(user_id_str)
+            if cid not in recommended_ids and cid not in following
+        }
+        
+        if mutual_follows:
+            fof_candidates = await db.users.find(
+                {"_id": {"$in": [ObjectId(cid) for cid in mutual_follows]}}, USER_PROJECTION
+            ).to_list(None)
             
-            if interest_overlap > 0:  # Only recommend if there's actual overlap
-                # Higher weight for interest overlap
-                follower_score = min(candidate.get("followerCount", 0) / 1000, 1.0)
-                # Interest overlap gets 80% weight, follower count gets 20%
-                final_score = interest_overlap * 0.8 + follower_score * 0.2
+            for candidate in fof_candidates:
+                cid = str(candidate["_id"])
+                # Check for interest overlap bonus
+                candidate_interests = set(str(i) for i in candidate.get("interests", []))
+                interest_overlap = len(candidate_interests.intersection(user_interests))
+                
+                # Base score for friend-of-friend, bonus for mutual follows and shared interests
+                base_score = 0.3
+                mutual_bonus = min(mutual_follows[cid] * 0.05, 0.3)
+                interest_bonus = interest_overlap * 0.1
+                follower_bonus = min(candidate.get("followerCount", 0) / 2000, 0.2)
                 
+                final_score = base_score + mutual_bonus + interest_bonus + follower_bonus
+                
+                recommended_ids.add(cid)
                 recommended.append({
                     "user_id": cid,
                     "username": candidate["username"],
@@ -376,61 +873,20 @@ def recommend_users(user_id: str, limit: int = 10):
                     "profilePicture": candidate.get("profilePicture"),
                     "score": final_score,
                     "shared_interests": interest_overlap,
-                    "recommendation_reason": "similar_interests"
+                    "mutual_follows": mutual_follows[cid],
+                    "recommendation_reason": "followed_by_friends"
                 })
 
-    # 2. MEDIUM PRIORITY: People followed by users you follow (friend-of-friend)
-    if len(recommended) < limit:
-        following_users = list(db.users.find({"_id": {"$in": user.get("following", [])}}))
-        friend_of_friend_ids = set()
-        
-        for followed_user in following_users:
-            for fof_id in followed_user.get("following", []):
-                fof_id_str = str(fof_id)
-                if fof_id_str != user_id_str and fof_id_str not in following:
-                    friend_of_friend_ids.add(fof_id)
-        
-        if friend_of_friend_ids:
-            fof_candidates = list(db.users.find({"_id": {"$in": list(friend_of_friend_ids)}}))
-            
-            for candidate in fof_candidates:
-                cid = str(candidate["_id"])
-                if not any(r["user_id"] == cid for r in recommended):  # Avoid duplicates
-                    # Check for interest overlap bonus
-                    candidate_interests = set(str(i) for i in candidate.get("interests", []))
-                    interest_overlap = len(candidate_interests.intersection(user_interests))
-                    
-                    # Base score for friend-of-friend, bonus for shared interests
-                    base_score = 0.3
-                    interest_bonus = interest_overlap * 0.1
-                    follower_bonus = min(candidate.get("followerCount", 0) / 2000, 0.2)
-                    
-                    final_score = base_score + interest_bonus + follower_bonus
-                    
-                    recommended.append({
-                        "user_id": cid,
-                        "username": candidate["username"],
-                        "fullName": candidate["fullName"],
-                        "bio": candidate.get("bio", ""),
-                        "followerCount": candidate.get("followerCount", 0),
-                        "followingCount": candidate.get("followingCount", 0),
-                        "isVerified": candidate.get("isVerified", False),
-                        "profilePicture": candidate.get("profilePicture"),
-                        "score": final_score,
-                        "shared_interests": interest_overlap,
-                        "recommendation_reason": "followed_by_friends"
-                    })
-
     # 3. LOWER PRIORITY: Popular users in interest categories (if still need more)
     if len(recommended) < limit:
-        popular_candidates = list(db.users.find({
+        popular_candidates = await db.users.find({
             "_id": {"$ne": ObjectId(user_id)},
             "followerCount": {"$gte": 10}  # At least some followers
-        }).sort("followerCount", -1).limit(50))
+        }, USER_PROJECTION).sort("followerCount", -1).limit(50).to_list(None)
         
         for candidate in popular_candidates:
             cid = str(candidate["_id"])
-            if cid not in following and not any(r["user_id"] == cid for r in recommended):
+            if cid not in following and cid not in recommended_ids:
                 candidate_interests = set(str(i) for i in candidate.get("interests", []))
                 interest_overlap = len(candidate_interests.intersection(user_interests))
                 
@@ -440,6 +896,7 @@ def recommend_users(user_id: str, limit: int = 10):
                     interest_score = interest_overlap * 0.1
                     final_score = follower_score + interest_score
                     
+                    recommended_ids.add(cid)
                     recommended.append({
                         "user_id": cid,
                         "username": candidate["username"],
@@ -460,22 +917,115 @@ def recommend_users(user_id: str, limit: int = 10):
 
     return {"suggested_users": recommended}
 
+@app.post("/seen/{user_id}")
+async def update_seen_posts(user_id: str, update: SeenPostsUpdate):
+    """
+    Tell this worker about newly seen posts so its seen cache stays current.
+
+    reset drops the cached history (e.g. after it was cleared). Either way the
+    user's cached feed responses are dropped. Workers that miss the
+    notification revalidate against lastUpdated once the TTL expires.
+    """
+    if update.reset:
+        seen_cache.invalidate(user_id)
+    else:
+        seen_cache.add(user_id, update.post_ids)
+    response_cache.invalidate(user_id)
+    return {"status": "ok", "cache": seen_cache.stats()}
+
+@app.post("/trending/events")
+def ingest_engagement(request: EngagementEvents):
+    """
+    Record like/comment/share events for trending.
+
+    Counters are per worker; with several workers, leave TRENDING_FROM_POOL
+    on instead so every worker sees the same engagement.
+    """
+    pool = candidate_pool
+    recorded = 0
+    for e in request.events:
+        if not ObjectId.is_valid(e.post_id):
+            continue
+        hashtags = e.hashtags
+        if hashtags is None:
+            rows = pool.find([e.post_id]) if pool is not None else []
+            hashtags = pool.docs[rows[0]].get("hashtags", []) if len(rows) else []
+        # Future timestamps would outweigh every real event
+        at = min(e.timestamp.timestamp(), time.time()) if e.timestamp else None
+        trending.record(e.post_id, EVENT_WEIGHTS[e.event], hashtags, at)
+        recorded += 1
+    return {"recorded": recorded}
+
+@app.get("/trending/posts", response_model=TrendingPostsResponse)
+def trending_posts(limit: int = 20):
+    """Posts with the most recent weighted engagement; velocity is per hour."""
+    top = trending.top_posts(limit)
+    pool = candidate_pool
+    docs = {}
+    if pool is not None:
+        for row in pool.find([post_id for post_id, _, _ in top]):
+            docs[pool.post_ids[row]] = post_summary(pool.docs[row])
+    response = {"posts": [
+        {"post_id": post_id, "score": score, "velocity": velocity, "post": docs.get(post_id)}
+        for post_id, score, velocity in top
+    ]}
+    return serialize("trending_posts", TrendingPostsResponse, response)
+
+@app.get("/trending/hashtags", response_model=TrendingHashtagsResponse)
+def trending_hashtags(limit: int = 20):
+    """Hashtags with the most recent weighted engagement; velocity is per hour."""
+    response = {"hashtags": [
+        {"hashtag": tag, "score": score, "velocity": velocity}
+        for tag, score, velocity in trending.top_hashtags(limit)
+    ]}
+    return serialize("trending_hashtags", TrendingHashtagsResponse, response)
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss counters and sizes of the per-worker caches."""
+    return {"responses": response_cache.stats(), "seen_posts": seen_cache.stats()}
+
 @app.get("/health")
-def health_check():
-    """Health check endpoint to verify the service is running."""
+async def health_check():
+    """Health check endpoint; pings MongoDB instead of assuming the client is connected."""
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout=HEALTH_PING_TIMEOUT)
+        database_connected = True
+    except Exception as e:
+        logging.warning(f"Database ping failed: {e}")
+        database_connected = False
+
     return {
-        "status": "healthy",
+        "status": "healthy" if database_connected else "degraded",
         "model_trained": model.trained,
-        "database_connected": True if db else False
+        "database_connected": database_connected,
+        "ready": "ready_seconds" in startup,
+        "startup": startup
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Request, stage and cache metrics in the Prometheus text exposition format."""
+    return render(
+        gauges("recommendation_response_cache", "Feed response cache", response_cache.stats()),
+        gauges("recommendation_seen_cache", "Seen-posts cache", seen_cache.stats()),
+        gauges("recommendation_trending", "Trending counters", trending.stats()),
+        gauges("recommendation_startup", "Seconds from module import to each startup milestone", startup),
+        gauges("recommendation_model", "Served model", {
+            "trained": int(model.trained),
+            "users": len(model.users),
+            "posts": len(model.posts),
+        }),
+    )
+
 @app.get("/model/status")
 def model_status():
     """Get the current status of the recommendation model."""
     status = {
         "trained": model.trained,
-        "user_features": len(model.mlb_user.classes_) if model.trained else 0,
-        "post_features": len(model.mlb_post.classes_) if model.trained else 0
+        "version": model.version,
+        "user_features": len(model.users) if model.trained else 0,
+        "post_features": len(model.posts) if model.trained else 0
     }
     
     # Add training metrics if available
@@ -483,3 +1033,42 @@ def model_status():
         status.update(model.training_metrics)
     
     return status
+
+@app.post("/model/swap")
+def swap_model_version(request: Optional[ModelSwapRequest] = None):
+    """
+    Promote a persisted model version and serve it without a restart.
+
+    Defaults to the version CURRENT points at. Other workers pick up the
+    promotion on their next reload check.
+    """
+    version = (request.version if request else None) or artifacts.current_version()
+    if not version:
+        raise HTTPException(status_code=404, detail="No persisted model version available")
+
+    try:
+        new_model = artifacts.load_version(version)
+        artifacts.promote(version)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model version {version} not found")
+
+    swap_model(new_model)
+    return {
+        "status": "swapped",
+        "version": version,
+        "user_features": len(new_model.users),
+        "post_features": len(new_model.posts)
+    }
+
+@app.get("/model/versions")
+def model_versions():
+    """List persisted model versions and the one currently promoted."""
+    return {
+        "current": artifacts.current_version(),
+        "loaded": model.version,
+        "versions": artifacts.list_versions()
+    }
+
+
+# End of module import; lifespan() reports the gap to IMPORT_STARTED as import time
+IMPORT_FINISHED = time.perf_counter()
@@ -0,0 +1,192 @@
+"""
+Request and stage metrics in the Prometheus text format, plus an opt-in
+sampling profiler.
+
+Histograms and counters live in this process only; each worker exposes its
+own /metrics and Prometheus aggregates across them.
+"""
+from collections import Counter as Tally
+from contextlib import contextmanager
+from datetime import datetime
+import bisect
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+# Fraction of requests profiled by the stack sampler (0 disables profiling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Seconds between stack samples of a profiled request
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+# Folded stacks (flamegraph.pl / speedscope input) are written here
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for label_values, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, as Prometheus expects."""
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [bucket counts..., +Inf count, sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.values.get(label_values)
+            if series is None:
+                series = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for label_values, series in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                    cumulative += count
+                    labels = format_labels(self.labels + ("le",), label_values + (str(bound),))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {series[-1]}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+REQUEST_SECONDS = Histogram(
+    "recommendation_request_duration_seconds", "HTTP request latency", ("method", "route", "status")
+)
+REQUESTS = Counter("recommendation_requests_total", "HTTP requests served", ("method", "route", "status"))
+STAGE_SECONDS = Histogram(
+    "recommendation_stage_duration_seconds", "Time spent in each request stage", ("endpoint", "stage")
+)
+
+
+@contextmanager
+def stage(endpoint, name):
+    """Time the enclosed block as one stage of `endpoint`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, endpoint, name)
+
+
+async def timed(endpoint, name, awaitable):
+    """Await `awaitable` as a stage; lets stages run concurrently under asyncio.gather."""
+    with stage(endpoint, name):
+        return await awaitable
+
+
+def render(*extra):
+    """All metrics in Prometheus text exposition format; `extra` are further pre-rendered lines."""
+    lines = []
+    for metric in (REQUESTS, REQUEST_SECONDS, STAGE_SECONDS):
+        lines.extend(metric.render())
+    for group in extra:
+        lines.extend(group)
+    return "\n".join(lines) + "\n"
+
+
+def gauges(prefix, help, values):
+    """Render a dict of numbers as one gauge per key."""
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"# HELP {prefix}_{key} {help}")
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key} {value}")
+    return lines
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a fixed interval from a background thread.
+
+    For an async request that is the event-loop thread, so samples of other
+    requests interleaved on the loop are included; profile under steady load
+    and read the result as where the worker spends time.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Tally()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+def should_profile():
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def write_profile(route, stacks, profile_dir=PROFILE_DIR):
+    """Write folded stacks ("frame;frame;frame count" per line) for one profiled request."""
+    if not stacks:
+        return None
+    os.makedirs(profile_dir, exist_ok=True)
+    name = route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+    path = os.path.join(profile_dir, f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{name}.folded")
+    try:
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+    except OSError as e:
+        logging.warning(f"Could not write profile {path}: {e}")
+        return None
+    return path
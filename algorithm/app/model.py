@@ -1,19 +1,200 @@
 import numpy as np
-import pandas as pd
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import MultiLabelBinarizer
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, precision_score, recall_score
-from bson import ObjectId
+import scipy.sparse as sp
+from scipy.special import expit
+from datetime import datetime
+from app.sweep import MODEL_SWEEP, SWEEP_FOLDS, run_sweep
+import json
 import logging
+import os
+import time
+import tracemalloc
+
+
+# sklearn is imported by the learner factories rather than at module level:
+# serving only needs the weights, so workers start without loading it
+
+
+def make_batch_learner(C=1.0, class_weight=None, solver="lbfgs"):
+    from sklearn.linear_model import LogisticRegression
+
+    return LogisticRegression(C=C, class_weight=class_weight, solver=solver, random_state=42, max_iter=1000)
+
+
+def make_online_learner():
+    from sklearn.linear_model import SGDClassifier
+
+    return SGDClassifier(
+        loss="log_loss", alpha=1e-4, learning_rate="constant", eta0=0.05, random_state=42
+    )
+
+
+class LinearWeights:
+    """
+    Weights of a persisted learner, standing in for it after load().
+
+    Scoring, saving and seeding incremental updates only read coef_ and
+    intercept_, so restoring the sklearn estimator itself is unnecessary.
+    """
+
+    def __init__(self, learner, coef, intercept):
+        self.learner = learner
+        self.coef_ = coef.reshape(1, -1)
+        self.intercept_ = np.asarray(intercept, dtype=np.float64).reshape(1)
+
+
+class Vocabulary:
+    """Maps ids to stable feature column indices in first-seen order."""
+
+    def __init__(self, ids=()):
+        self.ids = []
+        self.index = {}
+        self.add(ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, ids):
+        """Append unseen ids and return how many were added."""
+        added = 0
+        for i in ids:
+            if i not in self.index:
+                self.index[i] = len(self.ids)
+                self.ids.append(i)
+                added += 1
+        return added
+
+    def copy(self):
+        return Vocabulary(self.ids)
+
+    def lookup(self, ids):
+        """Column index for each id, -1 for ids outside the vocabulary."""
+        return np.fromiter((self.index.get(i, -1) for i in ids), dtype=np.int64, count=len(ids))
+
+
+def one_hot_pairs(user_idx, post_idx, n_users, n_posts):
+    """
+    Build the CSR feature matrix for (user, post) pairs.
+
+    Each row holds at most two nonzeros: the user column and the post column
+    (offset by n_users). Index -1 means unknown and leaves that block empty,
+    so memory grows with the number of rows, not users x posts.
+    """
+    user_idx = np.asarray(user_idx, dtype=np.int64)
+    post_idx = np.asarray(post_idx, dtype=np.int64)
+    rows = np.arange(len(user_idx), dtype=np.int64)
+
+    known_user = user_idx >= 0
+    known_post = post_idx >= 0
+    row_ind = np.concatenate([rows[known_user], rows[known_post]])
+    col_ind = np.concatenate([user_idx[known_user], post_idx[known_post] + n_users])
+    data = np.ones(len(row_ind), dtype=np.float64)
+
+    return sp.csr_matrix(
+        (data, (row_ind, col_ind)), shape=(len(user_idx), n_users + n_posts)
+    )
+
+
+class ScoreTable:
+    """
+    Dense per-id weights of the one-hot logistic model.
+
+    With one user and one post column per sample, p(like) is just
+    sigmoid(bias + w_user + w_post), so scoring is a dict lookup and a
+    vectorized gather instead of building a feature matrix per request.
+    """
+
+    def __init__(self, users, posts, coef, intercept):
+        coef = np.asarray(coef).reshape(-1)
+        self.users = users
+        self.posts = posts
+        self.bias = float(np.asarray(intercept).reshape(-1)[0])
+        # Views into coef, so memory-mapped weights stay memory-mapped
+        self.user_weights = coef[:len(users)]
+        self.post_weights = coef[len(users):]
+
+    def score(self, user_id, post_ids):
+        """Like probabilities for post_ids, or None when the user is unknown."""
+        user_idx = self.users.index.get(user_id, -1)
+        if user_idx < 0:
+            return None
+
+        post_idx = self.posts.lookup(post_ids)
+        # Unknown posts have no column, i.e. a zero post weight
+        post_w = self.post_weights[post_idx]
+        post_w[post_idx < 0] = 0.0
+        return expit(self.bias + self.user_weights[user_idx] + post_w)
+
+    def score_matrix(self, user_ids, post_ids):
+        """
+        Like probabilities for every (user, post) pair as one broadcast
+        (users x posts), plus a mask of which users are known.
+        """
+        user_idx = self.users.lookup(user_ids)
+        post_idx = self.posts.lookup(post_ids)
+        user_w = self.user_weights[user_idx]
+        post_w = self.post_weights[post_idx]
+        user_w[user_idx < 0] = 0.0
+        post_w[post_idx < 0] = 0.0
+        return expit(self.bias + user_w[:, None] + post_w[None, :]), user_idx >= 0
+
+
+def cold_start_fallback(cold_start, n_posts):
+    """Deterministic scores for an unknown user: the content scores, or a flat 0.2 without them."""
+    if cold_start is None:
+        return np.full(n_posts, 0.2)
+    return np.asarray(cold_start, dtype=np.float64)
+
+
+class Interactions:
+    """Training samples as columnar (user index, post index, label) arrays over their vocabularies."""
+
+    def __init__(self, users, posts, user_idx, post_idx, labels):
+        self.users = users
+        self.posts = posts
+        self.user_idx = np.asarray(user_idx, dtype=np.int64)
+        self.post_idx = np.asarray(post_idx, dtype=np.int64)
+        self.labels = np.asarray(labels, dtype=np.int64)
+
+    @classmethod
+    def from_records(cls, records):
+        user_ids = [r["user_id"] for r in records]
+        post_ids = [r["post_id"] for r in records]
+        users = Vocabulary(user_ids)
+        posts = Vocabulary(post_ids)
+        return cls(
+            users, posts, users.lookup(user_ids), posts.lookup(post_ids), [r["label"] for r in records]
+        )
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def positives(self):
+        return int(self.labels.sum())
+
+    @property
+    def negatives(self):
+        return len(self) - self.positives
+
+    def to_matrix(self):
+        return one_hot_pairs(self.user_idx, self.post_idx, len(self.users), len(self.posts))
+
 
 class RecommendationModel:
+    mode = "logistic"
+
     def __init__(self):
-        self.model = LogisticRegression(random_state=42, max_iter=1000)
-        self.mlb_user = MultiLabelBinarizer()
-        self.mlb_post = MultiLabelBinarizer()
+        # Fitted learner (or LinearWeights once loaded); None until trained
+        self.model = None
+        self.users = Vocabulary()
+        self.posts = Vocabulary()
         self.trained = False
         self.training_metrics = {}
+        # Data cutoff of the last full or incremental training run
+        self.checkpoint = None
+        # Artifact version this model was saved as or loaded from
+        self.version = None
+        self.score_table = None
 
     def train(self, interactions):
         """
@@ -23,38 +204,71 @@ class RecommendationModel:
             "post_id": "abc",
             "label": 1  # liked or not
         }
+        or an Interactions set with the same samples in columnar form.
         """
-        if not interactions or len(interactions) < 10:
+        if not isinstance(interactions, Interactions):
+            interactions = Interactions.from_records(interactions or [])
+
+        if len(interactions) < 10:
             logging.warning("Insufficient training data provided")
             return False
-            
-        try:
-            user_ids = [i["user_id"] for i in interactions]
-            post_ids = [i["post_id"] for i in interactions]
-            labels = [i["label"] for i in interactions]
 
+        # Imported before tracing starts so import cost stays out of the fit metrics
+        from sklearn.linear_model import LogisticRegression  # noqa: F401
+        from sklearn.metrics import accuracy_score, precision_score, recall_score
+        from sklearn.model_selection import train_test_split
+
+        own_trace = False
+        try:
             # Ensure we have both positive and negative samples
-            if len(set(labels)) < 2:
+            if len(np.unique(interactions.labels)) < 2:
                 logging.warning("Need both positive and negative samples for training")
                 return False
 
-            X_user = self.mlb_user.fit_transform([[uid] for uid in user_ids])
-            X_post = self.mlb_post.fit_transform([[pid] for pid in post_ids])
+            # Track peak allocations of feature building and fitting; leave
+            # tracing alone if someone else already started it
+            own_trace = not tracemalloc.is_tracing()
+            if own_trace:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            started = time.perf_counter()
+
+            learner = make_batch_learner()
+            X = interactions.to_matrix()
+            y = interactions.labels
 
-            X = np.hstack([X_user, X_post])
-            y = np.array(labels)
+            if MODEL_SWEEP and np.bincount(y).min() >= SWEEP_FOLDS:
+                # Cross-validate the config grid across cores, then refit the best on everything
+                best, results = run_sweep(X, y)
+                sweep_time = time.perf_counter() - started
+                learner = make_batch_learner(**best)
+                started = time.perf_counter()
+                learner.fit(X, y)
+                fit_time = time.perf_counter() - started
 
+                # Reported metrics are the best config's cross-validated ones
+                metrics = {
+                    key: results[0][key]
+                    for key in ("accuracy", "precision", "recall", "roc_auc", "average_precision")
+                }
+                metrics.update({
+                    "training_samples": len(interactions),
+                    "best_config": best,
+                    "sweep": results,
+                    "sweep_time_seconds": round(sweep_time, 4),
+                })
             # Split data for validation
-            if len(interactions) > 20:
+            elif len(interactions) > 20:
                 X_train, X_test, y_train, y_test = train_test_split(
                     X, y, test_size=0.2, random_state=42, stratify=y
                 )
-                
-                self.model.fit(X_train, y_train)
-                
+
+                learner.fit(X_train, y_train)
+                fit_time = time.perf_counter() - started
+
                 # Calculate metrics
-                y_pred = self.model.predict(X_test)
-                self.training_metrics = {
+                y_pred = learner.predict(X_test)
+                metrics = {
                     "accuracy": accuracy_score(y_test, y_pred),
                     "precision": precision_score(y_test, y_pred, average='weighted'),
                     "recall": recall_score(y_test, y_pred, average='weighted'),
@@ -62,45 +276,188 @@ class RecommendationModel:
                 }
             else:
                 # Not enough data for validation split
-                self.model.fit(X, y)
-                self.training_metrics = {
+                learner.fit(X, y)
+                fit_time = time.perf_counter() - started
+                metrics = {
                     "training_samples": len(interactions)
                 }
 
+            _, peak = tracemalloc.get_traced_memory()
+            if own_trace:
+                tracemalloc.stop()
+
+            metrics.update({
+                "fit_time_seconds": round(fit_time, 4),
+                "peak_memory_mb": round(peak / (1024 * 1024), 2),
+                "feature_nnz": int(X.nnz),
+            })
+
+            self.users, self.posts, self.model = interactions.users, interactions.posts, learner
+            self.training_metrics = metrics
+            self._refresh_score_table()
             self.trained = True
             return True
-            
+
         except Exception as e:
+            if own_trace and tracemalloc.is_tracing():
+                tracemalloc.stop()
             logging.error(f"Training failed: {str(e)}")
             return False
 
-    def predict(self, user_id, post_ids):
+    def partial_train(self, interactions):
+        """
+        Update the model with new interactions instead of refitting from scratch.
+
+        interactions: same shape as for train(). Users and posts the model has
+        not seen yet are appended to the vocabularies with zero weights, and the
+        learner continues from the current weights with one SGD (log loss) pass
+        over the new samples, so cost tracks the size of the update.
+        """
+        if not interactions:
+            logging.warning("No interactions provided for incremental training")
+            return False
+
+        try:
+            user_ids = [i["user_id"] for i in interactions]
+            post_ids = [i["post_id"] for i in interactions]
+            labels = [i["label"] for i in interactions]
+
+            started = time.perf_counter()
+
+            # Grow copies so concurrent predict() calls keep a consistent view
+            users = self.users.copy()
+            posts = self.posts.copy()
+            new_users = users.add(user_ids)
+            new_posts = posts.add(post_ids)
+
+            learner = self._online_learner(users, posts)
+            X = one_hot_pairs(users.lookup(user_ids), posts.lookup(post_ids), len(users), len(posts))
+            learner.partial_fit(X, np.array(labels))
+            fit_time = time.perf_counter() - started
+
+            self.users, self.posts, self.model = users, posts, learner
+            self._refresh_score_table()
+            self.trained = True
+
+            metrics = self.training_metrics
+            metrics["training_samples"] = metrics.get("training_samples", 0) + len(interactions)
+            metrics["incremental_updates"] = metrics.get("incremental_updates", 0) + 1
+            metrics["last_update_samples"] = len(interactions)
+            metrics["last_update_new_users"] = new_users
+            metrics["last_update_new_posts"] = new_posts
+            metrics["last_update_fit_time_seconds"] = round(fit_time, 4)
+            return True
+
+        except Exception as e:
+            logging.error(f"Incremental training failed: {str(e)}")
+            return False
+
+    def _online_learner(self, users, posts):
+        """SGD learner seeded with the current weights, padded for grown vocabularies."""
+        n_users, n_posts = len(self.users), len(self.posts)
+        if self.trained:
+            coef = self.model.coef_[0]
+            intercept = self.model.intercept_.copy()
+        else:
+            coef = np.zeros(n_users + n_posts)
+            intercept = np.zeros(1)
+
+        # Columns are [users | posts]; new ids get zero weights at the end of their block
+        coef = np.concatenate([
+            coef[:n_users],
+            np.zeros(len(users) - n_users),
+            coef[n_users:],
+            np.zeros(len(posts) - n_posts),
+        ])
+
+        learner = make_online_learner()
+        learner.classes_ = np.array([0, 1])
+        learner.coef_ = coef.reshape(1, -1)
+        learner.intercept_ = intercept
+        learner.n_features_in_ = coef.shape[0]
+        return learner
+
+    def _refresh_score_table(self):
+        # Built in one go and assigned once, so readers see weights and vocabularies that match
+        self.score_table = ScoreTable(self.users, self.posts, self.model.coef_, self.model.intercept_)
+
+    def predict(self, user_id, post_ids, cold_start=None):
+        """
+        Like scores for post_ids. Users the model has not seen get `cold_start`
+        (per-post content scores) when given, otherwise a flat 0.2.
+        """
         if not self.trained or not post_ids:
             return [0.1] * len(post_ids)  # Return low default scores
 
         try:
-            # Handle unknown users/posts gracefully
-            X_user = self.mlb_user.transform([[user_id]] * len(post_ids))
-            X_post = self.mlb_post.transform([[pid] for pid in post_ids])
-            X = np.hstack([X_user, X_post])
-
-            # Check if user or posts are unknown (all zeros in transformed features)
-            if X_user.sum() == 0:  # Unknown user
-                # Return random scores between 0.1 and 0.3 for unknown users
-                return np.random.uniform(0.1, 0.3, len(post_ids))
-            
-            probabilities = self.model.predict_proba(X)
-            if probabilities.shape[1] > 1:
-                return probabilities[:, 1]  # probability of like
-            else:
-                # Handle case where model only learned one class
-                return [0.5] * len(post_ids)
-                
+            scores = self.score_table.score(user_id, post_ids)
+            if scores is None:  # Unknown user
+                return cold_start_fallback(cold_start, len(post_ids))
+            return scores
+
         except Exception as e:
             logging.error(f"Prediction failed: {str(e)}")
             # Return default scores on error
             return [0.2] * len(post_ids)
-    
+
+    def predict_many(self, user_ids, post_ids, cold_start=None):
+        """Score matrix (users x posts) with the same per-user behaviour as predict()."""
+        shape = (len(user_ids), len(post_ids))
+        if not self.trained or not post_ids:
+            return np.full(shape, 0.1)
+
+        try:
+            scores, known = self.score_table.score_matrix(user_ids, post_ids)
+            unknown = ~known
+            if unknown.any():
+                scores[unknown] = cold_start_fallback(cold_start, len(post_ids))
+            return scores
+
+        except Exception as e:
+            logging.error(f"Prediction failed: {str(e)}")
+            return np.full(shape, 0.2)
+
+    def save(self, path):
+        """Write weights, vocabularies and metrics of a trained model into directory `path`."""
+        if not self.trained:
+            raise ValueError("Cannot save an untrained model")
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "coef.npy"), np.asarray(self.model.coef_[0]))
+        np.save(os.path.join(path, "user_ids.npy"), np.array(self.users.ids, dtype=str))
+        np.save(os.path.join(path, "post_ids.npy"), np.array(self.posts.ids, dtype=str))
+
+        meta = {
+            "mode": self.mode,
+            "learner": getattr(self.model, "learner", type(self.model).__name__),
+            "intercept": float(self.model.intercept_[0]),
+            "checkpoint": self.checkpoint.isoformat() if self.checkpoint else None,
+            "training_metrics": self.training_metrics,
+            "saved_at": datetime.now().isoformat(),
+        }
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Restore a model written by save(); weights are memory-mapped unless mmap is False."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+
+        mmap_mode = "r" if mmap else None
+        coef = np.load(os.path.join(path, "coef.npy"), mmap_mode=mmap_mode)
+
+        instance = cls()
+        instance.model = LinearWeights(meta["learner"], coef, meta["intercept"])
+        instance.users = Vocabulary(np.load(os.path.join(path, "user_ids.npy"), mmap_mode=mmap_mode).tolist())
+        instance.posts = Vocabulary(np.load(os.path.join(path, "post_ids.npy"), mmap_mode=mmap_mode).tolist())
+        instance.training_metrics = meta.get("training_metrics", {})
+        if meta.get("checkpoint"):
+            instance.checkpoint = datetime.fromisoformat(meta["checkpoint"])
+        instance._refresh_score_table()
+        instance.trained = True
+        return instance
+
     def get_training_metrics(self):
         """Return training metrics if available."""
         return self.training_metrics
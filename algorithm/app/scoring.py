@@ -0,0 +1,109 @@
+import numpy as np
+
+from app.candidates import binary_ids
+
+# Posts younger than this get the timeline recency boost
+RECENT_BOOST_SECONDS = 24 * 60 * 60
+
+
+def weighted_engagement(posts):
+    """likes * 0.5 + comments * 0.3 + shares * 0.2 per post."""
+    return posts.like_count * 0.5 + posts.comment_count * 0.3 + posts.share_count * 0.2
+
+
+def engagement_mix(posts):
+    """Weighted engagement relative to total interactions, in [0.2, 0.5] for engaged posts."""
+    total = posts.like_count + posts.comment_count + posts.share_count
+    return weighted_engagement(posts) / np.maximum(1, total)
+
+
+def explore_engagement(posts):
+    """likes + comments * 2 + shares * 3, the explore page's popularity key."""
+    return posts.like_count + posts.comment_count * 2 + posts.share_count * 3
+
+
+def interest_match(posts, interests):
+    """True where the post's category is one of the user's interests."""
+    if not interests:
+        return np.zeros(len(posts), dtype=bool)
+    return np.isin(posts.category, binary_ids(interests))
+
+
+def recency_boost(posts, now, boost=0.1):
+    return np.where(now - posts.created_at < RECENT_BOOST_SECONDS, boost, 0.0)
+
+
+def fallback_scores(posts, interests):
+    """Untrained-model score: 0.5 for an interest match plus engagement capped at 0.5."""
+    return interest_match(posts, interests) * 0.5 + np.minimum(weighted_engagement(posts) / 100, 0.5)
+
+
+def timeline_scores(posts, ml_scores, now):
+    """60% model score, 30% engagement mix and a 0.1 boost for posts under a day old."""
+    return np.asarray(ml_scores) * 0.6 + engagement_mix(posts) * 0.3 + recency_boost(posts, now)
+
+
+def top_k(scores, k):
+    """
+    Indices of the k highest scores, best first.
+
+    argpartition selects the top k in linear time, so only those k are
+    sorted. Ties keep candidate order like the stable sorts this replaces.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        top = np.sort(np.argpartition(-scores, k - 1)[:k])
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def model_scores(model, user_id, candidates):
+    """The model's like scores for the candidates, or None when there is nothing to score."""
+    if not model.trained or not len(candidates):
+        return None
+    return model.predict(user_id, candidates.post_ids, candidates.cold_start)
+
+
+def rank_timeline(candidates, scores, limit, now):
+    """Timeline posts: model blend given model scores, otherwise candidate (newest-first) order."""
+    if scores is not None:
+        # Combine scores: 60% ML, 30% engagement, 10% recency boost for recent posts
+        final_scores = timeline_scores(candidates, scores, now)
+        return [candidates.docs[i] for i in top_k(final_scores, limit)]
+
+    # Fallback to basic recommendation
+    return candidates.docs[:limit]
+
+
+def rank_explore(candidates, scores, limit, velocity=None):
+    """
+    Explore posts: 70% top model scores plus 30% most engaging of the rest.
+
+    Engagement is the trending velocity when any candidate has one, so the
+    engagement slots go to posts gaining traction now; total counts otherwise.
+    """
+    if velocity is not None and np.any(velocity > 0):
+        popularity = np.asarray(velocity)
+    else:
+        popularity = explore_engagement(candidates)
+
+    if scores is not None:
+        # Take top 70% by ML score and 30% with high engagement but diverse content
+        top_ml = top_k(scores, int(limit * 0.7))
+        remaining = np.ones(len(candidates), dtype=bool)
+        remaining[top_ml] = False
+        remaining = np.flatnonzero(remaining)
+
+        # From remaining, select posts with good engagement for diversity
+        engagement = popularity[remaining]
+        diverse = remaining[top_k(engagement, int(limit * 0.3))]
+
+        final = np.concatenate([top_ml, diverse])[:limit]
+        return [candidates.docs[i] for i in final]
+
+    # Fallback: sort by engagement
+    return [candidates.docs[i] for i in top_k(popularity, limit)]
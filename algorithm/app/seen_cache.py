@@ -0,0 +1,187 @@
+from collections import OrderedDict
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from bson import ObjectId
+
+SEEN_CACHE_SIZE = int(os.getenv("SEEN_CACHE_SIZE", "10000"))
+# Seconds a cached history is trusted before re-checking its lastUpdated stamp
+SEEN_CACHE_TTL = float(os.getenv("SEEN_CACHE_TTL", "60"))
+
+
+EMPTY = np.empty(0, dtype="S12")
+
+
+def to_binary_ids(post_ids):
+    """Sorted, de-duplicated array of raw 12-byte ObjectIds."""
+    raw = [ObjectId(pid).binary for pid in post_ids if ObjectId.is_valid(pid)]
+    return np.unique(np.array(raw, dtype="S12"))
+
+
+class SeenSet:
+    """A user's seen posts as a sorted array of 12-byte ObjectIds (binary search lookups)."""
+
+    __slots__ = ("ids", "last_updated", "checked_at")
+
+    def __init__(self, ids, last_updated=None):
+        self.ids = ids
+        self.last_updated = last_updated
+        self.checked_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, post_id):
+        if not len(self.ids):
+            return False
+        # Compare as S12 on both sides: numpy strips trailing NUL bytes from the
+        # elements it returns, so a raw 12-byte key ending in 0x00 never equals one
+        key = np.array([post_id.binary if isinstance(post_id, ObjectId) else post_id], dtype="S12")
+        pos = np.searchsorted(self.ids, key)[0]
+        return bool(pos < len(self.ids) and self.ids[pos] == key[0])
+
+    def contains(self, ids):
+        """Boolean mask of which raw 12-byte ids (an S12 array) are in the set."""
+        if not len(self.ids) or not len(ids):
+            return np.zeros(len(ids), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        return self.ids[pos] == ids
+
+    def merged(self, ids):
+        return SeenSet(np.union1d(self.ids, ids), self.last_updated)
+
+
+def seen_set(history):
+    return SeenSet(
+        np.unique(np.array([oid.binary for oid in history.get("seenPosts", [])], dtype="S12")),
+        history.get("lastUpdated"),
+    )
+
+
+class SeenPostsCache:
+    """
+    LRU cache of per-user seen posts with a TTL.
+
+    An expired entry is revalidated with a projection on lastUpdated and only
+    reloaded when the history actually changed. add() merges newly seen posts
+    into a cached entry so the next request sees them without a round-trip.
+    """
+
+    def __init__(self, max_users=SEEN_CACHE_SIZE, ttl=SEEN_CACHE_TTL):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, db, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None:
+                self.entries.move_to_end(user_id)
+
+        if entry is not None and time.monotonic() - entry.checked_at < self.ttl:
+            self.hits += 1
+            return entry
+
+        if entry is not None:
+            try:
+                stamp = await db.userposthistories.find_one({"user": ObjectId(user_id)}, {"lastUpdated": 1})
+            except Exception as e:
+                # Keep serving the expired entry; it is revalidated on the next request
+                logging.error(f"Error revalidating user seen posts: {e}")
+                return entry
+            if stamp and stamp.get("lastUpdated") == entry.last_updated:
+                self.hits += 1
+                entry.checked_at = time.monotonic()
+                return entry
+
+        self.misses += 1
+        loaded = await self.load(db, user_id)
+        if loaded is None:
+            # Not cached, so the history is read again once the database recovers
+            return entry if entry is not None else SeenSet(EMPTY)
+        self.put(user_id, loaded)
+        return loaded
+
+    async def load(self, db, user_id):
+        """The user's seen set, or None when the history could not be read."""
+        try:
+            history = await db.userposthistories.find_one(
+                {"user": ObjectId(user_id)}, {"seenPosts": 1, "lastUpdated": 1}
+            )
+        except Exception as e:
+            logging.error(f"Error fetching user seen posts: {e}")
+            return None
+
+        return seen_set(history) if history else SeenSet(EMPTY)
+
+    async def get_many(self, db, user_ids):
+        """Seen sets for many users; missing or expired ones are loaded with a single $in query."""
+        found, stale, expired = {}, [], {}
+        now = time.monotonic()
+        with self.lock:
+            for user_id in user_ids:
+                entry = self.entries.get(user_id)
+                if entry is not None and now - entry.checked_at < self.ttl:
+                    self.entries.move_to_end(user_id)
+                    found[user_id] = entry
+                else:
+                    stale.append(user_id)
+                    if entry is not None:
+                        expired[user_id] = entry
+
+        self.hits += len(found)
+        self.misses += len(stale)
+        if not stale:
+            return found
+
+        loaded = {user_id: SeenSet(EMPTY) for user_id in stale}
+        try:
+            cursor = db.userposthistories.find(
+                {"user": {"$in": [ObjectId(user_id) for user_id in stale]}},
+                {"user": 1, "seenPosts": 1, "lastUpdated": 1}
+            )
+            async for history in cursor:
+                loaded[str(history["user"])] = seen_set(history)
+        except Exception as e:
+            # Fall back to expired entries (or empty histories) for this call and cache nothing
+            logging.error(f"Error fetching user seen posts: {e}")
+            found.update({user_id: expired.get(user_id, SeenSet(EMPTY)) for user_id in stale})
+            return found
+
+        for user_id, entry in loaded.items():
+            self.put(user_id, entry)
+        found.update(loaded)
+        return found
+
+    def put(self, user_id, entry):
+        with self.lock:
+            self.entries[user_id] = entry
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_users:
+                self.entries.popitem(last=False)
+
+    def add(self, user_id, post_ids):
+        """Merge newly seen posts into a cached entry; uncached users load fresh on next get()."""
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None:
+                self.entries[user_id] = entry.merged(to_binary_ids(post_ids))
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def stats(self):
+        return {
+            "users": len(self.entries),
+            "max_users": self.max_users,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
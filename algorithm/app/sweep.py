@@ -0,0 +1,127 @@
+"""
+Hyperparameter sweep for the logistic model.
+
+Every (config, fold) pair of a k-fold cross-validation over regularization
+strength, class weighting and solver is fitted in a process pool. The
+feature matrix is written once as .npy arrays that workers memory-map
+read-only, so they share the page cache instead of each receiving a pickled
+copy. Each fold is scored with ranking metrics (ROC AUC and average
+precision) next to the classification metrics /model/status reports.
+
+Enable with MODEL_SWEEP=1; RecommendationModel.train then refits the best
+config on all samples and records every config's results in training_metrics.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+MODEL_SWEEP = os.getenv("MODEL_SWEEP", "0") == "1"
+SWEEP_WORKERS = int(os.getenv("SWEEP_WORKERS", str(os.cpu_count() or 1)))
+SWEEP_FOLDS = int(os.getenv("SWEEP_FOLDS", "3"))
+SWEEP_C = [float(c) for c in os.getenv("SWEEP_C", "0.1,1,10").split(",")]
+SWEEP_CLASS_WEIGHTS = [None if w == "none" else w for w in os.getenv("SWEEP_CLASS_WEIGHTS", "none,balanced").split(",")]
+SWEEP_SOLVERS = os.getenv("SWEEP_SOLVERS", "lbfgs,liblinear").split(",")
+
+
+def sweep_configs(cs=SWEEP_C, class_weights=SWEEP_CLASS_WEIGHTS, solvers=SWEEP_SOLVERS):
+    return [
+        {"C": c, "class_weight": weight, "solver": solver}
+        for c, weight, solver in itertools.product(cs, class_weights, solvers)
+    ]
+
+
+def folds(y, n_folds, seed=42):
+    """Stratified (train, test) index pairs; deterministic, so every worker derives the same ones."""
+    from sklearn.model_selection import StratifiedKFold
+
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    return list(splitter.split(np.zeros(len(y)), y))
+
+
+def write_shared(X, y, path):
+    """Dump the CSR arrays and labels for workers to memory-map."""
+    X = X.tocsr()
+    np.save(os.path.join(path, "data.npy"), X.data)
+    np.save(os.path.join(path, "indices.npy"), X.indices)
+    np.save(os.path.join(path, "indptr.npy"), X.indptr)
+    np.save(os.path.join(path, "labels.npy"), np.asarray(y))
+    return X.shape
+
+
+# Per-process state of a sweep worker, set up once by _init_worker()
+_worker = {}
+
+
+def _init_worker(path, shape, n_folds):
+    from threadpoolctl import threadpool_limits
+
+    # One BLAS thread per worker; the pool already uses every core
+    threadpool_limits(1)
+    arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ("data", "indices", "indptr")]
+    _worker["X"] = sp.csr_matrix(tuple(arrays), shape=shape, copy=False)
+    _worker["y"] = np.load(os.path.join(path, "labels.npy"), mmap_mode="r")
+    _worker["folds"] = folds(_worker["y"], n_folds)
+
+
+def _fit_fold(task):
+    from sklearn.metrics import (
+        accuracy_score, average_precision_score, precision_score, recall_score, roc_auc_score
+    )
+    from app.model import make_batch_learner
+
+    config_idx, config, fold = task
+    X, y = _worker["X"], _worker["y"]
+    train, test = _worker["folds"][fold]
+
+    learner = make_batch_learner(**config)
+    started = time.perf_counter()
+    learner.fit(X[train], y[train])
+    fit_time = time.perf_counter() - started
+
+    y_test = np.asarray(y[test])
+    scores = learner.predict_proba(X[test])[:, 1]
+    y_pred = (scores >= 0.5).astype(y_test.dtype)
+    return config_idx, {
+        "fit_time_seconds": fit_time,
+        "roc_auc": roc_auc_score(y_test, scores),
+        "average_precision": average_precision_score(y_test, scores),
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision_score(y_test, y_pred, average="weighted", zero_division=0),
+        "recall": recall_score(y_test, y_pred, average="weighted", zero_division=0),
+    }
+
+
+def run_sweep(X, y, configs=None, n_folds=SWEEP_FOLDS, workers=SWEEP_WORKERS):
+    """
+    Cross-validate every config and return (best config, per-config results).
+
+    Results hold each config with its fold-averaged metrics, best first by
+    ROC AUC then average precision.
+    """
+    configs = configs or sweep_configs()
+    tasks = [(i, config, fold) for i, config in enumerate(configs) for fold in range(n_folds)]
+    path = tempfile.mkdtemp(prefix="sweep-")
+    try:
+        shape = write_shared(X, y, path)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context,
+                                 initializer=_init_worker, initargs=(path, shape, n_folds)) as executor:
+            fold_results = list(executor.map(_fit_fold, tasks))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    results = []
+    for i, config in enumerate(configs):
+        runs = [metrics for config_idx, metrics in fold_results if config_idx == i]
+        averaged = {key: round(float(np.mean([r[key] for r in runs])), 4) for key in runs[0]}
+        results.append({**config, **averaged})
+    results.sort(key=lambda r: (r["roc_auc"], r["average_precision"]), reverse=True)
+    best = {key: results[0][key] for key in ("C", "class_weight", "solver")}
+    return best, results
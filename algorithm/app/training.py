@@ -0,0 +1,269 @@
+"""
+Full training runs as jobs in a separate process.
+
+POST /train starts a job and returns its id right away; the child process
+extracts interactions, fits a fresh model and publishes it as the CURRENT
+artifact version. Serving workers keep answering from their current model
+and swap in the new version with one reference assignment once it is
+published, so feed latency is not tied to training.
+
+Job status lives in small JSON files under TRAINING_JOBS_DIR, so any worker
+can answer GET /train/{job_id}, not only the one that started the job. A
+lock file there names the job in flight, so only one job runs across all
+workers sharing the directory; records carry the pid of the process doing
+the work, so a job whose process died is reported as failed.
+"""
+from datetime import datetime
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+
+from app import artifacts
+from app.database import connect_sync
+from app.extract import extract_interactions
+
+TRAINING_JOBS_DIR = os.getenv("TRAINING_JOBS_DIR", os.path.join(artifacts.MODEL_DIR, "jobs"))
+# Finished job records kept on disk
+TRAINING_JOBS_KEEP = int(os.getenv("TRAINING_JOBS_KEEP", "50"))
+
+FINISHED = ("trained", "no_data", "failed")
+
+# Names the job in flight; created exclusively so concurrent starts cannot both win
+LOCK_FILE = "running.lock"
+
+
+def job_path(job_id, jobs_dir=TRAINING_JOBS_DIR):
+    return os.path.join(jobs_dir, f"{job_id}.json")
+
+
+def read_job(job_id, jobs_dir=TRAINING_JOBS_DIR):
+    """The job's status record, or None for an unknown id."""
+    try:
+        with open(job_path(job_id, jobs_dir)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_job(job, jobs_dir=TRAINING_JOBS_DIR):
+    """Replace the job's status record atomically, so readers never see a partial file."""
+    os.makedirs(jobs_dir, exist_ok=True)
+    job["updated_at"] = datetime.now().isoformat()
+    tmp_path = job_path(job["job_id"], jobs_dir) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(job, f, default=str)
+    os.replace(tmp_path, job_path(job["job_id"], jobs_dir))
+
+
+def update_job(job, jobs_dir=TRAINING_JOBS_DIR, **fields):
+    job.update(fields)
+    write_job(job, jobs_dir)
+
+
+def prune_jobs(jobs_dir=TRAINING_JOBS_DIR, keep=TRAINING_JOBS_KEEP):
+    """Delete the oldest finished job records beyond `keep`."""
+    if not os.path.isdir(jobs_dir):
+        return
+    records = sorted(
+        (os.path.join(jobs_dir, name) for name in os.listdir(jobs_dir) if name.endswith(".json")),
+        key=os.path.getmtime,
+    )
+    for path in records[:-keep] if keep > 0 else records:
+        try:
+            with open(path) as f:
+                if json.load(f).get("status") in FINISHED:
+                    os.remove(path)
+        except (OSError, ValueError):
+            pass
+
+
+def new_job(mode=artifacts.MODEL_MODE, jobs_dir=TRAINING_JOBS_DIR):
+    """Record a queued job and return it."""
+    prune_jobs(jobs_dir)
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "status": "queued",
+        "stage": None,
+        "progress": 0.0,
+        "mode": mode,
+        "created_at": datetime.now().isoformat(),
+        # The starting worker until the training process records itself
+        "pid": os.getpid(),
+        "host": socket.gethostname(),
+    }
+    write_job(job, jobs_dir)
+    return job
+
+
+def process_alive(job):
+    """False only when the job's process is known to be gone (it ran on this host and its pid is free)."""
+    if "pid" not in job or job.get("host") != socket.gethostname():
+        return True
+    try:
+        os.kill(job["pid"], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def claim(job_id, jobs_dir=TRAINING_JOBS_DIR):
+    """Take the lock file for `job_id`; False if another job holds it."""
+    os.makedirs(jobs_dir, exist_ok=True)
+    tmp_path = os.path.join(jobs_dir, f"{job_id}.lock.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(job_id)
+    try:
+        # link() fails if the lock exists, and the lock never appears without its job id
+        os.link(tmp_path, os.path.join(jobs_dir, LOCK_FILE))
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(tmp_path)
+
+
+def locked_job_id(jobs_dir=TRAINING_JOBS_DIR):
+    try:
+        with open(os.path.join(jobs_dir, LOCK_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def release(job_id, jobs_dir=TRAINING_JOBS_DIR):
+    """Drop the lock file if `job_id` still holds it."""
+    if locked_job_id(jobs_dir) == job_id:
+        try:
+            os.remove(os.path.join(jobs_dir, LOCK_FILE))
+        except FileNotFoundError:
+            pass
+
+
+def run_job(job, jobs_dir=TRAINING_JOBS_DIR, db=None):
+    """
+    Body of the training process: extract, fit, publish, recording progress as it goes.
+
+    Connects its own client unless `db` is given (the benchmark trains
+    in-process against mongomock, which a child process cannot see).
+    """
+    logging.basicConfig(level=logging.INFO)
+    job.update(pid=os.getpid(), host=socket.gethostname())
+    timings = {}
+    client = None
+    if db is None:
+        client, db = connect_sync()
+    try:
+        checkpoint = datetime.now()
+        update_job(job, jobs_dir, status="running", stage="extract", progress=0.1)
+        started = time.perf_counter()
+        interactions = extract_interactions(db)
+        timings["extract"] = time.perf_counter() - started
+
+        if not len(interactions):
+            update_job(job, jobs_dir, status="no_data", stage=None, progress=1.0, timings=timings,
+                       message="No interaction data found for training")
+            return
+
+        update_job(job, jobs_dir, stage="fit", progress=0.4, total_samples=len(interactions),
+                   positive_samples=interactions.positives, negative_samples=interactions.negatives)
+        started = time.perf_counter()
+        model = artifacts.new_model(job["mode"])
+        trained = model.train(interactions)
+        timings["fit"] = time.perf_counter() - started
+        if not trained:
+            update_job(job, jobs_dir, status="failed", stage=None, timings=timings,
+                       message="Training failed, see the service logs")
+            return
+
+        update_job(job, jobs_dir, stage="publish", progress=0.9)
+        started = time.perf_counter()
+        model.checkpoint = checkpoint
+        version = artifacts.publish(model)
+        timings["publish"] = time.perf_counter() - started
+
+        update_job(job, jobs_dir, status="trained", stage=None, progress=1.0, version=version,
+                   timings=timings, training_metrics=model.get_training_metrics())
+    except Exception as e:
+        logging.error(f"Training job {job['job_id']} failed: {e}")
+        update_job(job, jobs_dir, status="failed", stage=None, timings=timings, message=str(e))
+    finally:
+        if client is not None:
+            client.close()
+        release(job["job_id"], jobs_dir)
+
+
+class TrainingJobs:
+    """Starts training processes for this worker and tracks the job in flight across workers."""
+
+    def __init__(self, jobs_dir=TRAINING_JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        # spawn: the child must not inherit the serving process's Mongo clients or event loop
+        self.context = multiprocessing.get_context("spawn")
+        self.process = None
+        self.job = None
+
+    def running(self):
+        """The job in flight on any worker sharing jobs_dir, else None."""
+        job_id = locked_job_id(self.jobs_dir)
+        job = self.status(job_id) if job_id else None
+        if job is None or job.get("status") in FINISHED:
+            return None
+        return job
+
+    def start(self, mode=artifacts.MODEL_MODE):
+        """
+        Launch a training process unless a job is already in flight on any worker.
+
+        Returns (job, started): the new job and True, or the job in flight and False.
+        """
+        while True:
+            running = self.running()
+            if running:
+                return running, False
+            # A lock left behind by a finished or unknown job is stale
+            stale = locked_job_id(self.jobs_dir)
+            if stale:
+                release(stale, self.jobs_dir)
+
+            job = new_job(mode, self.jobs_dir)
+            if claim(job["job_id"], self.jobs_dir):
+                break
+            # Another worker started one first
+            os.remove(job_path(job["job_id"], self.jobs_dir))
+
+        # Not a daemon: daemonic processes cannot start the sweep's process pool
+        self.process = self.context.Process(target=run_job, args=(job, self.jobs_dir))
+        self.process.start()
+        self.job = job
+        return job, True
+
+    def wait(self):
+        """Block until the current process exits; returns its final job record."""
+        process, job = self.process, self.job
+        process.join()
+        record = read_job(job["job_id"], self.jobs_dir) or job
+        if record.get("status") not in FINISHED:
+            # The process died without recording an outcome
+            record.update(status="failed", stage=None, message=f"Training process exited with {process.exitcode}")
+            write_job(record, self.jobs_dir)
+        release(job["job_id"], self.jobs_dir)
+        return record
+
+    def status(self, job_id):
+        """The job's record; an unfinished job whose process is gone is marked failed."""
+        job = read_job(job_id, self.jobs_dir)
+        if job is None or job.get("status") in FINISHED or process_alive(job):
+            return job
+        # Re-read: the process may have recorded its outcome just before exiting
+        job = read_job(job_id, self.jobs_dir)
+        if job.get("status") not in FINISHED:
+            job.update(status="failed", stage=None, message=f"Training process {job['pid']} is gone")
+            write_job(job, self.jobs_dir)
+        release(job_id, self.jobs_dir)
+        return job
@@ -0,0 +1,204 @@
+"""
+Trending posts and hashtags from a stream of engagement events.
+
+Every like/comment/share adds its weight to exponentially decayed counters,
+so a post's score is its recent weighted engagement and its velocity is
+that score expressed per hour. Counts live in a count-min sketch with a
+bounded set of heavy hitters on top, so memory is fixed and each event
+costs O(sketch depth) regardless of how many posts or hashtags exist.
+
+Decay is applied forward: an event at time t adds exp(rate * (t - t0))
+instead of shrinking every counter as time passes. Relative order never
+changes with time, so the heavy-hitter heap stays valid, and the counters
+are rescaled to a new t0 before the weights grow too large.
+
+Events arrive through POST /trending/events or, by default, from the
+growth of engagement counts between candidate pool refreshes. Counters are
+per worker process, like the other in-memory indexes.
+"""
+import heapq
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from app.candidates import locate
+from app.scoring import explore_engagement
+
+# Seconds for an event's weight to halve
+TRENDING_HALF_LIFE = float(os.getenv("TRENDING_HALF_LIFE", "3600"))
+# Keys tracked exactly enough to rank; the rest only live in the sketch
+TRENDING_CAPACITY = int(os.getenv("TRENDING_CAPACITY", "1000"))
+TRENDING_SKETCH_WIDTH = int(os.getenv("TRENDING_SKETCH_WIDTH", str(2 ** 14)))
+TRENDING_SKETCH_DEPTH = int(os.getenv("TRENDING_SKETCH_DEPTH", "4"))
+# Derive events from engagement count growth between candidate pool refreshes (0 to rely on /trending/events)
+TRENDING_FROM_POOL = os.getenv("TRENDING_FROM_POOL", "1") == "1"
+
+# Same weighting as the explore popularity key
+EVENT_WEIGHTS = {"like": 1.0, "comment": 2.0, "share": 3.0}
+
+# Rescale once forward-decayed weights reach e^30
+RESCALE_EXPONENT = 30.0
+
+
+class CountMinSketch:
+    """Approximate counts per key; never under-estimates, over-estimates only on hash collisions."""
+
+    def __init__(self, width=TRENDING_SKETCH_WIDTH, depth=TRENDING_SKETCH_DEPTH):
+        self.width = width
+        self.table = np.zeros((depth, width), dtype=np.float64)
+        self.rows = np.arange(depth)
+
+    def _columns(self, key):
+        # Double hashing: depth column indices from one 64-bit hash
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        return ((h & 0xFFFFFFFF) + self.rows * ((h >> 32) | 1)) % self.width
+
+    def add(self, key, amount):
+        """Add `amount` with conservative update and return the key's new estimate."""
+        columns = self._columns(key)
+        cells = self.table[self.rows, columns]
+        estimate = float(cells.min()) + amount
+        self.table[self.rows, columns] = np.maximum(cells, estimate)
+        return estimate
+
+    def estimate(self, key):
+        return float(self.table[self.rows, self._columns(key)].min())
+
+    def scale(self, factor):
+        self.table *= factor
+
+
+class TrendingCounter:
+    """Exponentially decayed counts per key, with the heaviest `capacity` keys kept in a heap."""
+
+    def __init__(self, half_life=TRENDING_HALF_LIFE, capacity=TRENDING_CAPACITY,
+                 width=TRENDING_SKETCH_WIDTH, depth=TRENDING_SKETCH_DEPTH):
+        self.rate = math.log(2) / half_life
+        self.capacity = capacity
+        self.sketch = CountMinSketch(width, depth)
+        # Heavy hitters: key -> forward-decayed estimate; the min-heap may hold stale entries
+        self.top = {}
+        self.heap = []
+        self.origin = time.time()
+        self.events = 0
+
+    def add(self, key, amount=1.0, at=None):
+        if amount <= 0:
+            return
+        at = time.time() if at is None else at
+        exponent = self.rate * (at - self.origin)
+        if exponent > RESCALE_EXPONENT:
+            self._rescale(at)
+            exponent = 0.0
+        estimate = self.sketch.add(key, amount * math.exp(exponent))
+        self.events += 1
+        self._track(key, estimate)
+
+    def _track(self, key, estimate):
+        if key in self.top or len(self.top) < self.capacity:
+            self.top[key] = estimate
+            heapq.heappush(self.heap, (estimate, key))
+        else:
+            # Drop stale heap entries until the smallest live heavy hitter is on top
+            while self.top.get(self.heap[0][1]) != self.heap[0][0]:
+                heapq.heappop(self.heap)
+            lowest, lowest_key = self.heap[0]
+            if estimate <= lowest:
+                return
+            heapq.heapreplace(self.heap, (estimate, key))
+            del self.top[lowest_key]
+            self.top[key] = estimate
+        if len(self.heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        self.heap = [(value, key) for key, value in self.top.items()]
+        heapq.heapify(self.heap)
+
+    def _rescale(self, now):
+        factor = math.exp(-self.rate * (now - self.origin))
+        self.sketch.scale(factor)
+        self.top = {key: value * factor for key, value in self.top.items()}
+        self._rebuild_heap()
+        self.origin = now
+
+    def _decay(self, now):
+        return math.exp(-self.rate * ((time.time() if now is None else now) - self.origin))
+
+    def score(self, key, now=None):
+        """Decayed weighted count of `key` as of `now`."""
+        return self.sketch.estimate(key) * self._decay(now)
+
+    def ranked(self, k, now=None):
+        """The k heaviest keys as (key, decayed score), highest first."""
+        decay = self._decay(now)
+        return [(key, value * decay) for key, value in heapq.nlargest(k, self.top.items(), key=lambda kv: kv[1])]
+
+    def scores(self, keys, now=None):
+        """Decayed scores of `keys`; 0 for keys outside the heavy hitters."""
+        decay = self._decay(now)
+        return np.array([self.top.get(key, 0.0) for key in keys], dtype=np.float64) * decay
+
+    def per_hour(self, score):
+        """Event rate that would sustain `score` under this decay."""
+        return score * self.rate * 3600
+
+
+class Trending:
+    """Post and hashtag counters fed by the same engagement events."""
+
+    def __init__(self, half_life=TRENDING_HALF_LIFE, capacity=TRENDING_CAPACITY):
+        self.posts = TrendingCounter(half_life, capacity)
+        self.hashtags = TrendingCounter(half_life, capacity)
+        self.lock = threading.Lock()
+
+    def record(self, post_id, weight, hashtags=(), at=None):
+        with self.lock:
+            self.posts.add(post_id, weight, at)
+            for tag in hashtags:
+                self.hashtags.add(tag.lower(), weight, at)
+
+    def observe_pool(self, previous, current):
+        """
+        Record the engagement each post gained between two candidate pool snapshots.
+
+        Posts created after the previous snapshot count their whole
+        engagement; posts that left the window are ignored.
+        """
+        weighted = explore_engagement(current)
+        gained = np.where(current.created_at > previous.loaded_at.timestamp(), weighted, 0.0)
+
+        # Rows of `current` whose post was also in `previous`
+        sorted_rows = locate(previous.sorted_ids, current.ids)
+        present = np.isin(current.ids, previous.sorted_ids[sorted_rows])
+        before = explore_engagement(previous)
+        gained[present] = np.maximum(weighted[present] - before[previous.id_order[sorted_rows]], 0.0)
+
+        now = time.time()
+        for row in np.flatnonzero(gained > 0):
+            self.record(current.post_ids[row], gained[row], current.docs[row].get("hashtags", []), now)
+
+    def velocity(self, post_ids, now=None):
+        """Weighted engagement per hour of each post (0 unless it is among the trending posts)."""
+        with self.lock:
+            return self.posts.per_hour(self.posts.scores(post_ids, now))
+
+    def top_posts(self, k, now=None):
+        with self.lock:
+            return [(key, score, self.posts.per_hour(score)) for key, score in self.posts.ranked(k, now)]
+
+    def top_hashtags(self, k, now=None):
+        with self.lock:
+            return [(key, score, self.hashtags.per_hour(score)) for key, score in self.hashtags.ranked(k, now)]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "post_events": self.posts.events,
+                "tracked_posts": len(self.posts.top),
+                "hashtag_events": self.hashtags.events,
+                "tracked_hashtags": len(self.hashtags.top),
+            }
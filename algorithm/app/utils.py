@@ -4,16 +4,20 @@ from datetime import datetime, timedelta
 def oid_str(x):
     return str(x) if isinstance(x, ObjectId) else x
 
-def get_user_seen_posts(db, user_id):
-    """Get list of post IDs that the user has already seen"""
-    try:
-        user_history = db.userposthistories.find_one({"user": ObjectId(user_id)})
-        if user_history and "seenPosts" in user_history:
-            return [oid_str(post_id) for post_id in user_history["seenPosts"]]
-        return []
-    except Exception as e:
-        print(f"Error fetching user seen posts: {e}")
-        return []
+def post_summary(p):
+    """Response fields for a post in the timeline and explore feeds."""
+    return {
+        "post_id": oid_str(p["_id"]),
+        "text": p["text"],
+        "author": oid_str(p["author"]),
+        "category": oid_str(p["category"]) if p.get("category") else None,
+        "likeCount": p.get("likeCount", 0),
+        "commentCount": p.get("commentCount", 0),
+        "shareCount": p.get("shareCount", 0),
+        "createdAt": p["createdAt"],
+        "hashtags": p.get("hashtags", []),
+        "media": p.get("media", [])
+    }
 
 def get_time_filtered_query(days_back=3):
     """Get MongoDB query filter for posts within specified days"""
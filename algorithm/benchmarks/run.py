@@ -0,0 +1,217 @@
+"""
+End-to-end benchmark of the recommendation service.
+
+Generates a synthetic dataset, trains a model as a POST /train job and then
+drives /predict and every /recommend/* endpoint in-process over ASGI,
+reporting throughput, p50/p99 latency and peak RSS per step:
+
+    python -m benchmarks.run --interactions 100000
+    python -m benchmarks.run --interactions 10000000 --mongodb-uri mongodb://localhost:27017
+    python -m benchmarks.run --interactions 1000000 --output before.json
+
+Without --mongodb-uri the data lives in mongomock (fine up to a few hundred
+thousand interactions); larger runs need a local mongod. Run from the
+algorithm directory with the packages in benchmarks/requirements.txt.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import generate
+
+BENCH_DATABASE = "recommendation_bench"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation service")
+    parser.add_argument("--interactions", type=int, default=10000, help="likes to generate (10k to 10M)")
+    parser.add_argument("--seen-per-user", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mongodb-uri", help="use this mongod instead of mongomock")
+    parser.add_argument("--database", default=BENCH_DATABASE)
+    parser.add_argument("--model-mode", choices=("logistic", "als"), default=None)
+    parser.add_argument("--response-cache", action="store_true", help="keep the response cache on")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def summarize(name, latencies, elapsed, errors):
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "step": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2) if len(latencies) else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2) if len(latencies) else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def drive(client, name, requests, concurrency):
+    """Send `requests` ((method, path, json) tuples) with up to `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def send(method, path, body):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400 or b'"error"' in response.content[:64]:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(*request) for request in requests))
+    return summarize(name, latencies, time.perf_counter() - started, errors)
+
+
+def configure_environment(args, model_dir):
+    """Settings read at import time by app.main, so this runs before importing it."""
+    os.environ["MODEL_DIR"] = model_dir
+    os.environ["MONGO_INITDB_DATABASE"] = args.database
+    if args.mongodb_uri:
+        os.environ["MONGODB_URI"] = args.mongodb_uri
+    if args.model_mode:
+        os.environ["MODEL_MODE"] = args.model_mode
+    if not args.response_cache:
+        os.environ["RESPONSE_CACHE_TTL"] = "0"
+    # Keep background work to what the request path needs
+    os.environ.setdefault("FEED_REFRESH_INTERVAL", "0")
+    os.environ.setdefault("MODEL_RELOAD_INTERVAL", "0")
+
+
+def attach_mongomock(service, database):
+    """Point the service at one in-memory store shared by its sync and async clients."""
+    try:
+        import mongomock
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("mongomock and mongomock-motor are required without --mongodb-uri "
+                 "(pip install -r benchmarks/requirements.txt)")
+
+    store = mongomock.MongoClient()
+    service.training_db = store[database]
+    service.db = AsyncMongoMockClient(mock_mongo_client=store)[database]
+
+
+async def wait_for(predicate, timeout=300):
+    started = time.monotonic()
+    while not predicate() and time.monotonic() - started < timeout:
+        await asyncio.sleep(0.05)
+
+
+async def train(client, service, in_process):
+    """
+    Time a full training run until the new model is served.
+
+    The training process cannot see mongomock's in-memory store, so without
+    a mongod the job body runs in a thread of this process instead.
+    """
+    from app import artifacts, training
+
+    started = time.perf_counter()
+    if in_process:
+        job = training.new_job(jobs_dir=service.training_jobs.jobs_dir)
+        await asyncio.to_thread(training.run_job, job, service.training_jobs.jobs_dir, service.training_db)
+        if job["status"] == "trained":
+            service.swap_model(artifacts.load_version(job["version"]))
+        errors = int(job["status"] != "trained")
+    else:
+        job = (await client.post("/train")).json()
+        await wait_for(lambda: service.model.version is not None
+                       and service.training_jobs.running() is None, timeout=3600)
+        errors = int(service.training_jobs.status(job["job_id"])["status"] != "trained")
+    elapsed = time.perf_counter() - started
+    return summarize("train", [elapsed], elapsed, errors)
+
+
+async def run(args):
+    import httpx
+
+    configure_environment(args, tempfile.mkdtemp(prefix="bench-models-"))
+    from app import main as service
+
+    if not args.mongodb_uri:
+        attach_mongomock(service, args.database)
+    # Seeding needs the clients before the service's lifespan would create them
+    service.connect()
+
+    results = []
+    started = time.perf_counter()
+    dataset = generate(
+        service.training_db, args.interactions, seen_per_user=args.seen_per_user, seed=args.seed
+    )
+    elapsed = time.perf_counter() - started
+    results.append(summarize("generate", [elapsed], elapsed, 0))
+
+    rng = np.random.default_rng(args.seed)
+    sample = [dataset["user_ids"][i] for i in rng.integers(0, len(dataset["user_ids"]), args.requests)]
+
+    async with service.lifespan(service.app):
+        await wait_for(lambda: service.candidate_pool is not None and service.follow_graph is not None)
+
+        transport = httpx.ASGITransport(app=service.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            results.append(await train(client, service, in_process=not args.mongodb_uri))
+            results[-1]["training_metrics"] = service.model.get_training_metrics()
+
+            for name, path in (
+                ("predict", "/predict/{}"),
+                ("timeline", "/recommend/timeline/{}"),
+                ("explore", "/recommend/explore/{}"),
+                ("users", "/recommend/users/{}"),
+            ):
+                requests = [("GET", path.format(uid), None) for uid in sample]
+                results.append(await drive(client, name, requests, args.concurrency))
+
+            batches = [sample[i:i + 100] for i in range(0, len(sample), 100)]
+            requests = [("POST", "/recommend/timeline/batch", {"user_ids": batch}) for batch in batches]
+            results.append(await drive(client, "timeline_batch", requests, args.concurrency))
+
+    return {
+        "dataset": {k: v for k, v in dataset.items() if k != "user_ids"},
+        "backend": "mongod" if args.mongodb_uri else "mongomock",
+        "model_mode": os.environ.get("MODEL_MODE", "logistic"),
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+
+
+def print_report(report):
+    dataset = report["dataset"]
+    print(f"{dataset['likes']} likes, {dataset['users']} users, {dataset['posts']} posts "
+          f"({report['backend']}, {report['model_mode']} model, concurrency {report['concurrency']})")
+    print(f"{'step':<16}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'peak RSS MB':>13}")
+    for r in report["results"]:
+        print(f"{r['step']:<16}{r['requests']:>10}{r['errors']:>8}{r['throughput_rps']:>10}"
+              f"{r['p50_ms']:>10}{r['p99_ms']:>10}{r['peak_rss_mb']:>13}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Synthetic users, posts, likes and seen histories for benchmarking.
+
+Sizes derive from the number of like interactions so one knob scales the
+whole dataset; popularity follows a Zipf-like curve so a few posts and
+authors collect most of the engagement, as on the real feed.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+
+INSERT_BATCH = 10000
+
+
+def dataset_shape(interactions):
+    """Users, posts and categories for a dataset with `interactions` likes."""
+    return {
+        "users": max(100, interactions // 50),
+        "posts": max(500, interactions // 20),
+        "categories": 20,
+    }
+
+
+def zipf_weights(n, exponent, rng):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def insert_batched(collection, docs):
+    for start in range(0, len(docs), INSERT_BATCH):
+        collection.insert_many(docs[start:start + INSERT_BATCH], ordered=False)
+
+
+def generate(db, interactions=10000, seen_per_user=50, following_per_user=20, days=7, seed=42):
+    """
+    Fill `db` (pymongo or mongomock, sync) with a synthetic dataset; returns its sizes and user ids.
+
+    Existing users, posts, userposthistories and categories are dropped first.
+    """
+    rng = np.random.default_rng(seed)
+    shape = dataset_shape(interactions)
+    n_users, n_posts, n_categories = shape["users"], shape["posts"], shape["categories"]
+    now = datetime.now()
+
+    for name in ("users", "posts", "userposthistories", "categories", "recommended_feeds"):
+        db[name].drop()
+
+    category_ids = [ObjectId() for _ in range(n_categories)]
+    user_ids = [ObjectId() for _ in range(n_users)]
+    post_ids = [ObjectId() for _ in range(n_posts)]
+
+    # Follows and authorship both concentrate on popular users
+    user_popularity = zipf_weights(n_users, 1.1, rng)
+    follow_counts = np.minimum(rng.poisson(following_per_user, n_users), n_users - 1)
+    following = [
+        np.unique(rng.choice(n_users, size=count, p=user_popularity)) for count in follow_counts
+    ]
+    followers = np.bincount(np.concatenate(following), minlength=n_users) if n_users else []
+
+    insert_batched(db.categories, [
+        {"_id": cid, "name": f"category-{i}", "createdAt": now, "updatedAt": now}
+        for i, cid in enumerate(category_ids)
+    ])
+    insert_batched(db.users, [{
+        "_id": user_ids[u],
+        "username": f"user{u}",
+        "fullName": f"User {u}",
+        "email": f"user{u}@example.com",
+        "bio": "",
+        "interests": [category_ids[c] for c in rng.choice(n_categories, size=3, replace=False)],
+        "following": [user_ids[f] for f in following[u] if f != u],
+        "followerCount": int(followers[u]),
+        "followingCount": len(following[u]),
+        "isVerified": bool(followers[u] > 1000),
+        "createdAt": now - timedelta(days=30),
+        "updatedAt": now,
+    } for u in range(n_users)])
+
+    # Likes: (user, post) pairs with Zipf post popularity, de-duplicated
+    post_popularity = zipf_weights(n_posts, 1.05, rng)
+    liker = rng.integers(0, n_users, interactions)
+    liked = rng.choice(n_posts, size=interactions, p=post_popularity)
+    pairs = np.unique(liked.astype(np.int64) * n_users + liker)
+    liked, liker = pairs // n_users, pairs % n_users
+    likes_by_post = np.split(liker, np.searchsorted(liked, np.arange(1, n_posts)))
+
+    authors = rng.choice(n_users, size=n_posts, p=user_popularity)
+    categories = rng.integers(0, n_categories, n_posts)
+    ages = rng.uniform(0, days * 24 * 3600, n_posts)
+    insert_batched(db.posts, [{
+        "_id": post_ids[p],
+        "author": user_ids[authors[p]],
+        "text": f"Synthetic post {p} #topic{p % 50}",
+        "media": [],
+        "likes": [user_ids[u] for u in likes_by_post[p]],
+        "likeCount": len(likes_by_post[p]),
+        "commentCount": int(rng.poisson(2)),
+        "shareCount": int(rng.poisson(0.5)),
+        "isRepost": False,
+        "category": category_ids[categories[p]],
+        "hashtags": [f"topic{p % 50}"],
+        "mentions": [],
+        "visibility": "public",
+        "createdAt": now - timedelta(seconds=float(ages[p])),
+        "updatedAt": now,
+    } for p in range(n_posts)])
+
+    insert_batched(db.userposthistories, [{
+        "user": user_ids[u],
+        "seenPosts": [post_ids[p] for p in np.unique(rng.integers(0, n_posts, seen_per_user))],
+        "lastUpdated": now - timedelta(hours=float(rng.uniform(0, 48))),
+        "createdAt": now,
+        "updatedAt": now,
+    } for u in range(n_users)])
+
+    return {**shape, "likes": int(len(pairs)), "user_ids": [str(u) for u in user_ids]}
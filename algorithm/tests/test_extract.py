@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+import mongomock
+import pytest
+
+from app.extract import get_interactions_since, save_marks
+
+CHECKPOINT = datetime(2026, 1, 1)
+BEFORE = CHECKPOINT - timedelta(days=1)
+AFTER = CHECKPOINT + timedelta(hours=1)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # mongomock's bulk_write does not accept current pymongo operations; apply them one by one
+    def bulk_write(self, requests, ordered=True):
+        for op in requests:
+            self.update_one(op._filter, op._doc, upsert=op._upsert)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", bulk_write)
+    return mongomock.MongoClient()["test"]
+
+
+def pairs(interactions):
+    return {(i["user_id"], i["post_id"], i["label"]) for i in interactions}
+
+
+def test_seen_post_liked_before_checkpoint_is_not_a_negative(db):
+    user, liked, skipped = ObjectId(), ObjectId(), ObjectId()
+    db.posts.insert_many([
+        {"_id": liked, "likes": [user], "updatedAt": BEFORE},
+        {"_id": skipped, "likes": [], "updatedAt": BEFORE},
+    ])
+    db.userposthistories.insert_one({"user": user, "seenPosts": [liked, skipped], "lastUpdated": AFTER})
+
+    interactions, _ = get_interactions_since(db, CHECKPOINT)
+
+    assert pairs(interactions) == {(str(user), str(skipped), 0)}
+
+
+def test_consumed_events_are_not_replayed(db):
+    user, other, post, seen = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+    db.posts.insert_many([
+        {"_id": post, "likes": [user], "updatedAt": AFTER},
+        {"_id": seen, "likes": [], "updatedAt": BEFORE},
+    ])
+    db.userposthistories.insert_one({"user": user, "seenPosts": [seen], "lastUpdated": AFTER})
+
+    interactions, marks = get_interactions_since(db, CHECKPOINT)
+    assert pairs(interactions) == {(str(user), str(post), 1), (str(user), str(seen), 0)}
+    save_marks(db, marks)
+
+    # A comment touches the post and the user sees nothing new: nothing to learn
+    assert get_interactions_since(db, CHECKPOINT)[0] == []
+
+    # Only the new like and the newly seen post come back
+    newer = ObjectId()
+    db.posts.insert_one({"_id": newer, "likes": [], "updatedAt": BEFORE})
+    db.posts.update_one({"_id": post}, {"$push": {"likes": other}})
+    db.userposthistories.update_one({"user": user}, {"$push": {"seenPosts": newer}})
+    interactions, _ = get_interactions_since(db, CHECKPOINT)
+    assert pairs(interactions) == {(str(other), str(post), 1), (str(user), str(newer), 0)}
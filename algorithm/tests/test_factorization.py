@@ -0,0 +1,29 @@
+import numpy as np
+
+from app.factorization import FactorizationModel
+
+
+def interactions():
+    records = [
+        {"user_id": f"u{u}", "post_id": f"p{p}", "label": 1}
+        for u in range(6) for p in range(u, u + 4)
+    ]
+    # u9 only has a negative and p99 is never liked: neither has a like row
+    records.append({"user_id": "u9", "post_id": "p99", "label": 0})
+    return records
+
+
+def test_users_and_posts_without_likes_are_unknown():
+    model = FactorizationModel()
+    assert model.train(interactions())
+
+    assert "u9" not in model.users.index
+    assert "p99" not in model.posts.index
+    assert len(model.index.items) == len(model.posts)
+
+    cold_start = [0.3, 0.5, 0.7]
+    posts = ["p0", "p1", "p2"]
+    assert np.allclose(model.predict("u9", posts, cold_start), cold_start)
+    assert np.allclose(model.predict_many(["u9"], posts, [cold_start])[0], cold_start)
+    assert len(model.retrieve("u9", 3)) == 0
+    assert len(model.retrieve("u0", 3)) == 3
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.follow_graph import FollowGraph
+
+A, B, C = ObjectId(), ObjectId(), ObjectId()
+STAMP = datetime(2026, 1, 1)
+
+
+def user(_id, following=(), interests=(), follower_count=0):
+    return {
+        "_id": _id,
+        "following": list(following),
+        "interests": list(interests),
+        "followerCount": follower_count,
+        "updatedAt": STAMP,
+    }
+
+
+def test_unchanged_rows_skip_the_rebuild():
+    graph = FollowGraph()
+    docs = [user(A, [B]), user(B, [C]), user(C)]
+    assert graph.apply(docs) == 3
+    matrix = graph.matrix
+
+    # The inclusive updatedAt refresh re-reads the latest rows unchanged
+    assert graph.apply(docs[1:]) == 0
+    assert graph.matrix is matrix
+    assert graph.friends_of_friends(str(A)) == [(str(C), 1)]
+
+
+def test_changed_row_is_rebuilt():
+    graph = FollowGraph()
+    graph.apply([user(A, [B]), user(B, [C]), user(C)])
+
+    assert graph.apply([user(A, [B, C]), user(B, [C])]) == 1
+    assert graph.friends_of_friends(str(A)) == []
+    assert graph.apply([user(C, interests=["music"], follower_count=5)]) == 1
+    assert graph.similar_interests(str(A), ["music"]) == [(str(C), 1)]
@@ -0,0 +1,21 @@
+import numpy as np
+
+from app.factorization import IVFIndex
+
+
+def test_subset_search_matches_masked_full_search():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(5000, 8)).astype(np.float32)
+    index = IVFIndex.build(vectors, n_lists=50, iterations=3)
+    ids = np.sort(rng.choice(len(vectors), 500, replace=False))
+    subset = index.subset(ids)
+
+    for _ in range(10):
+        query = rng.normal(size=8).astype(np.float32)
+        eligible = rng.random(len(ids)) < 0.5
+        allowed = np.zeros(len(vectors), dtype=bool)
+        allowed[ids[eligible]] = True
+
+        found = ids[subset.search(query, 20, allowed=eligible)]
+        assert eligible[np.searchsorted(ids, found)].all()
+        assert sorted(found) == sorted(index.search(query, 20, allowed=allowed))
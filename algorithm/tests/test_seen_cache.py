@@ -0,0 +1,61 @@
+import asyncio
+
+import numpy as np
+from bson import ObjectId
+
+from app.seen_cache import SeenPostsCache, SeenSet, to_binary_ids
+
+# Last byte 0x00: numpy S12 arrays strip trailing NULs from the elements they return
+TRAILING_NUL = ObjectId("65f0a1b2c3d4e5f601020300")
+
+
+def test_contains_id_ending_in_nul_byte():
+    other = ObjectId("65f0a1b2c3d4e5f6010203ff")
+    seen = SeenSet(to_binary_ids([str(TRAILING_NUL), str(other)]))
+
+    assert TRAILING_NUL in seen
+    assert TRAILING_NUL.binary in seen
+    assert other in seen
+    assert ObjectId("65f0a1b2c3d4e5f601020301") not in seen
+
+
+def test_contains_many_matches_membership():
+    ids = [TRAILING_NUL, ObjectId("65f0a1b2c3d4e5f601020000"), ObjectId()]
+    seen = SeenSet(to_binary_ids([str(ids[0]), str(ids[1])]))
+    wanted = np.array([oid.binary for oid in ids + [ObjectId()]], dtype="S12")
+
+    assert seen.contains(wanted).tolist() == [True, True, False, False]
+    assert SeenSet(np.empty(0, dtype="S12")).contains(wanted).tolist() == [False] * 4
+
+
+class Histories:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.doc = {"seenPosts": [TRAILING_NUL], "lastUpdated": 1}
+
+    async def find_one(self, query, projection=None):
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        return self.doc
+
+
+class Database:
+    def __init__(self, fail=False):
+        self.userposthistories = Histories(fail)
+
+
+def test_failed_load_is_not_cached():
+    cache = SeenPostsCache(ttl=60)
+    user_id = str(ObjectId())
+
+    assert len(asyncio.run(cache.get(Database(fail=True), user_id))) == 0
+    assert cache.stats()["users"] == 0
+    assert TRAILING_NUL in asyncio.run(cache.get(Database(), user_id))
+
+
+def test_failed_revalidation_serves_the_expired_entry():
+    cache = SeenPostsCache(ttl=0)
+    user_id = str(ObjectId())
+    asyncio.run(cache.get(Database(), user_id))
+
+    assert TRAILING_NUL in asyncio.run(cache.get(Database(fail=True), user_id))
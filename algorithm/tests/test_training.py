@@ -0,0 +1,61 @@
+import subprocess
+from types import SimpleNamespace
+
+from app import training
+from app.training import TrainingJobs, locked_job_id, read_job, write_job
+
+
+class Process:
+    """Stands in for the training process so no Mongo connection is attempted."""
+
+    def __init__(self, target, args):
+        self.args = args
+
+    def start(self):
+        pass
+
+
+def jobs(path):
+    jobs = TrainingJobs(str(path))
+    jobs.context = SimpleNamespace(Process=Process)
+    return jobs
+
+
+def test_one_job_across_workers(tmp_path):
+    first, second = jobs(tmp_path), jobs(tmp_path)
+
+    job, started = first.start()
+    assert started
+    assert locked_job_id(str(tmp_path)) == job["job_id"]
+
+    # Another worker sharing the directory gets the job in flight
+    running, started = second.start()
+    assert not started
+    assert running["job_id"] == job["job_id"]
+
+
+def test_job_of_dead_process_is_failed(tmp_path):
+    first = jobs(tmp_path)
+    job, _ = first.start()
+
+    dead = subprocess.Popen(["true"])
+    dead.wait()
+    job.update(status="running", pid=dead.pid)
+    write_job(job, str(tmp_path))
+
+    assert first.status(job["job_id"])["status"] == "failed"
+    assert read_job(job["job_id"], str(tmp_path))["status"] == "failed"
+    assert locked_job_id(str(tmp_path)) is None
+
+    # The lock is free again, so a new job can start
+    assert jobs(tmp_path).start()[1]
+
+
+def test_finished_job_releases_the_lock(tmp_path):
+    first = jobs(tmp_path)
+    job, _ = first.start()
+    training.update_job(job, str(tmp_path), status="trained")
+    training.release(job["job_id"], str(tmp_path))
+
+    assert first.running() is None
+    assert jobs(tmp_path).start()[1]
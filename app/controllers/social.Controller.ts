@@ -628,14 +628,29 @@ export async function trainRecommendationModel(
 ): Promise<void> {
   try {
     // Check if user is admin (you might want to add admin role check here)
-    const trainingResult = await recommendationService.trainModel();
-    res.json(trainingResult);
+    // Training runs in the background; poll the returned job for progress
+    const job = await recommendationService.startTraining();
+    res.status(202).json(job);
   } catch (error) {
     console.error("Error training recommendation model:", error);
     res.status(500).json({ error: "Failed to train recommendation model" });
   }
 }
 
+// Get the status and progress of a training job
+export async function getRecommendationTrainingJob(
+  req: AuthenticatedRequest,
+  res: Response
+): Promise<void> {
+  try {
+    const job = await recommendationService.getTrainingJob(req.params.jobId);
+    res.json(job);
+  } catch (error) {
+    console.error("Error getting training job:", error);
+    res.status(500).json({ error: "Failed to get training job" });
+  }
+}
+
 // Get recommendation model status
 export async function getRecommendationModelStatus(
   req: AuthenticatedRequest,
@@ -2,6 +2,7 @@ import { Response } from "express";
 import { UserPostHistory } from "../models";
 import { Types } from "mongoose";
 import { AuthenticatedRequest } from "../middleware/auth";
+import { recommendationService } from "../services/recommendationService";
 
 // Record that a user has seen specific posts
 export async function recordSeenPosts(
@@ -61,6 +62,12 @@ export async function recordSeenPosts(
 
     await userHistory.save();
 
+    // Keep the recommender's seen cache in step without waiting on it
+    recommendationService.notifySeenPosts(
+      userId.toString(),
+      validPostIds.map((id) => id.toString())
+    );
+
     res.json({
       success: true,
       message: `Recorded ${validPostIds.length} posts as seen`,
@@ -138,6 +145,8 @@ export async function clearSeenPosts(
       { upsert: true }
     );
 
+    recommendationService.notifySeenPosts(userId.toString(), [], true);
+
     res.json({
       success: true,
       message: "Seen posts history cleared",
@@ -17,6 +17,7 @@ import {
   getExplorePosts,
   getRecommendedUsers,
   trainRecommendationModel,
+  getRecommendationTrainingJob,
   getRecommendationModelStatus,
 } from "../controllers/social.Controller";
 import {
@@ -88,6 +89,7 @@ router.get("/ai/explore", authenticateToken, getExplorePosts);
 router.get("/ai/users/recommended", authenticateToken, getRecommendedUsers);
 router.get("/ai/model/status", authenticateToken, getRecommendationModelStatus);
 router.post("/ai/model/train", authenticateToken, trainRecommendationModel);
+router.get("/ai/model/train/:jobId", authenticateToken, getRecommendationTrainingJob);
 
 // User post history routes (protected)
 router.post("/user/seen-posts", authenticateToken, recordSeenPosts);
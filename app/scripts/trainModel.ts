@@ -5,9 +5,9 @@ import { User } from "../models";
 /**
  * Script to train the recommendation model
  *
- * This script connects to the database and calls the trainModel endpoint
- * of the recommendation service. It can be used to trigger model training
- * without going through the API.
+ * This script connects to the database, starts a training job on the
+ * recommendation service and polls it until the new model is published.
+ * It can be used to trigger model training without going through the API.
  *
  * Usage:
  * - Run this script: `npx ts-node app/scripts/trainModel.ts`
@@ -48,11 +48,22 @@ async function trainRecommendationModel(): Promise<void> {
     console.log("🔄 Training recommendation model...");
     console.log("This may take a few minutes depending on data size.");
 
-    // Call the recommendation service to train the model
-    const result = await recommendationService.trainModel();
+    // Start a training job on the recommendation service and poll it
+    let lastStage: string | null | undefined;
+    const result = await recommendationService.trainModel((job) => {
+      if (job.stage !== lastStage) {
+        console.log(
+          `⏳ Job ${job.job_id}: ${job.stage ?? job.status} (${Math.round(
+            job.progress * 100
+          )}%)`
+        );
+        lastStage = job.stage;
+      }
+    });
 
     if (result.status === "trained") {
       console.log("✅ Model training completed successfully!");
+      console.log(`📦 Model version: ${result.version}`);
       console.log(`📈 Training statistics:`);
       console.log(`- Total samples: ${result.total_samples}`);
       console.log(`- Positive samples: ${result.positive_samples}`);
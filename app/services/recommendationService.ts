@@ -35,6 +35,12 @@ export interface TimelineResponse {
   timeline: RecommendationPost[];
 }
 
+export interface BatchTimelineEntry {
+  user_id: string;
+  timeline?: RecommendationPost[];
+  error?: string;
+}
+
 export interface PredictionsResponse {
   predictions: RecommendationPost[];
 }
@@ -55,14 +61,30 @@ export interface TrainingResponse {
   message?: string;
 }
 
+export interface TrainingJobResponse extends TrainingResponse {
+  job_id: string;
+  stage?: string | null;
+  progress: number;
+  version?: string;
+  created_at: string;
+  updated_at: string;
+}
+
+// Job statuses after which the training process has exited
+const FINISHED_TRAINING_STATUSES = ["trained", "no_data", "failed"];
+
 export interface ModelStatusResponse {
   trained: boolean;
+  version?: string | null;
   user_features: number;
   post_features: number;
   accuracy?: number;
   precision?: number;
   recall?: number;
   training_samples?: number;
+  fit_time_seconds?: number;
+  peak_memory_mb?: number;
+  feature_nnz?: number;
 }
 
 class RecommendationService {
@@ -90,6 +112,30 @@ class RecommendationService {
     }
   }
 
+  async getRecommendedTimelinesBatch(
+    userIds: string[],
+    limit: number = 20
+  ): Promise<BatchTimelineEntry[]> {
+    try {
+      // The service streams one JSON object per user (NDJSON)
+      const response = await axios.post(
+        `${this.baseURL}/recommend/timeline/batch`,
+        { user_ids: userIds, limit },
+        {
+          timeout: 120000,
+          responseType: "text",
+        }
+      );
+      return (response.data as string)
+        .split("\n")
+        .filter((line) => line.trim().length > 0)
+        .map((line) => JSON.parse(line) as BatchTimelineEntry);
+    } catch (error) {
+      console.error("Error fetching batch timelines:", error);
+      throw new Error("Failed to fetch batch timelines");
+    }
+  }
+
   async getPredictedLikes(
     userId: string,
     limit: number = 10
@@ -144,19 +190,87 @@ class RecommendationService {
     }
   }
 
-  async trainModel(): Promise<TrainingResponse> {
+  async startTraining(): Promise<TrainingJobResponse> {
     try {
+      // Returns as soon as the training process is started (or the running job)
       const response = await axios.post(
         `${this.baseURL}/train`,
         {},
         {
-          timeout: 60000, // 60 second timeout for training
+          timeout: 10000,
         }
       );
       return response.data;
     } catch (error) {
-      console.error("Error training model:", error);
-      throw new Error("Failed to train model");
+      console.error("Error starting model training:", error);
+      throw new Error("Failed to start model training");
+    }
+  }
+
+  async getTrainingJob(jobId: string): Promise<TrainingJobResponse> {
+    try {
+      const response = await axios.get(`${this.baseURL}/train/${jobId}`, {
+        timeout: 5000,
+      });
+      return response.data;
+    } catch (error) {
+      console.error("Error getting training job:", error);
+      throw new Error("Failed to get training job");
+    }
+  }
+
+  async trainModel(
+    onProgress?: (job: TrainingJobResponse) => void,
+    pollIntervalMs: number = 2000,
+    timeoutMs: number = 60 * 60 * 1000
+  ): Promise<TrainingJobResponse> {
+    // Start a training job and poll it until the new model is published
+    let job = await this.startTraining();
+    const deadline = Date.now() + timeoutMs;
+
+    while (!FINISHED_TRAINING_STATUSES.includes(job.status)) {
+      onProgress?.(job);
+      if (Date.now() > deadline) {
+        throw new Error(`Training job ${job.job_id} did not finish in time`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, pollIntervalMs));
+      job = await this.getTrainingJob(job.job_id);
+    }
+    return job;
+  }
+
+  async trainModelIncremental(): Promise<TrainingResponse> {
+    try {
+      const response = await axios.post(
+        `${this.baseURL}/train/incremental`,
+        {},
+        {
+          timeout: 60000,
+        }
+      );
+      return response.data;
+    } catch (error) {
+      console.error("Error updating model incrementally:", error);
+      throw new Error("Failed to update model incrementally");
+    }
+  }
+
+  async notifySeenPosts(
+    userId: string,
+    postIds: string[],
+    reset: boolean = false
+  ): Promise<void> {
+    try {
+      await axios.post(
+        `${this.baseURL}/seen/${userId}`,
+        { post_ids: postIds, reset },
+        {
+          timeout: 2000,
+        }
+      );
+    } catch (error) {
+      // The service revalidates its cache on its own; a missed update only delays it
+      console.warn("Could not notify recommendation service of seen posts:", error);
     }
   }
 